@@ -0,0 +1,164 @@
+import os
+import time
+
+import numpy as np
+
+ANN_INDEX = os.getenv("ANN_INDEX", "ivf")
+# Stores smaller than this are searched exactly; brute force is faster there
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "5000"))
+# Lists probed per query: higher means better recall and slower queries
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 picks about 4 * sqrt(rows)
+
+TRAIN_ROWS_PER_LIST = 64
+KMEANS_ITERATIONS = 10
+ASSIGN_BLOCK_ROWS = 4096
+
+
+def top_k(scores, ids, k):
+    """(score, id) pairs for the k highest scores, best first"""
+    if not len(scores):
+        return []
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(float(scores[i]), int(ids[i])) for i in top]
+
+
+class ExactIndex:
+    """Brute-force search over every row of a VectorStore"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def sync(self):
+        return 0
+
+    def save(self):
+        pass
+
+    def search(self, query_vector, k=3):
+        """Return up to k (score, row) pairs, best first"""
+        scores = self.store.scores(query_vector)
+        return top_k(scores, np.arange(len(scores)), k)
+
+
+class IVFIndex:
+    """Inverted-file index: rows are bucketed by their nearest k-means centroid.
+
+    A query scores the centroids, then only the rows in the nprobe closest
+    buckets. New store rows are added with sync() without retraining; call
+    train() again when the store has grown well past the training size.
+    """
+
+    def __init__(self, store, nlist=IVF_NLIST, nprobe=IVF_NPROBE):
+        self.store = store
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.path = store.path + ".ivf.npz"
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.lists = []
+        self.trained_rows = 0
+
+    @classmethod
+    def load_or_build(cls, store, nlist=IVF_NLIST, nprobe=IVF_NPROBE):
+        """Load the saved index, retrain it if the store outgrew it, and add any new rows"""
+        index = cls(store, nlist=nlist, nprobe=nprobe)
+        if os.path.exists(index.path):
+            with np.load(index.path) as data:
+                index.centroids = data["centroids"]
+                index.assignments = data["assignments"]
+                index.trained_rows = int(data["trained_rows"])
+            # Rows dropped from the store (e.g. a repaired tail) drop out of the index too
+            index.assignments = index.assignments[:len(store)]
+            index._build_lists()
+        if index.centroids is None or len(store) > 4 * max(index.trained_rows, 1):
+            index.train()
+        else:
+            index.sync()
+        return index
+
+    def _build_lists(self):
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]].astype(np.int64) for i in range(len(self.centroids))]
+
+    def _assign(self, start, end):
+        """Nearest centroid for store rows [start, end), in blocks"""
+        matrix = self.store.matrix
+        out = np.empty(end - start, dtype=np.int32)
+        for offset in range(start, end, ASSIGN_BLOCK_ROWS):
+            block = np.asarray(matrix[offset:min(offset + ASSIGN_BLOCK_ROWS, end)], dtype=np.float32)
+            out[offset - start:offset - start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return out
+
+    def train(self, seed=0):
+        """Spherical k-means on a sample of the store, then assign every row"""
+        rows = len(self.store)
+        if not rows:
+            return
+        nlist = self.nlist or max(1, int(4 * np.sqrt(rows)))
+        nlist = min(nlist, rows)
+        rng = np.random.default_rng(seed)
+        sample_ids = np.sort(rng.choice(rows, size=min(rows, nlist * TRAIN_ROWS_PER_LIST), replace=False))
+        sample = np.asarray(self.store.matrix[sample_ids], dtype=np.float32)
+
+        start = time.perf_counter()
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(labels, minlength=nlist)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums = np.zeros_like(centroids)
+            sums[counts > 0] = np.add.reduceat(sample[np.argsort(labels)], starts[counts > 0])
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = self._assign(0, rows)
+        self.trained_rows = rows
+        self._build_lists()
+        print(f"Trained IVF index: {nlist} lists over {rows} rows in {time.perf_counter() - start:.1f}s")
+
+    def sync(self):
+        """Add store rows appended since the index was built; returns how many"""
+        start, end = len(self.assignments), len(self.store)
+        if end <= start:
+            return 0
+        new = self._assign(start, end)
+        self.assignments = np.concatenate([self.assignments, new])
+        for list_id in np.unique(new):
+            rows = np.flatnonzero(new == list_id) + start
+            self.lists[list_id] = np.concatenate([self.lists[list_id], rows])
+        return end - start
+
+    def save(self):
+        if self.centroids is None:
+            return
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, assignments=self.assignments, trained_rows=self.trained_rows)
+        os.replace(tmp_path, self.path)
+
+    def search(self, query_vector, k=3, nprobe=None):
+        """Return up to k (score, row) pairs, best first"""
+        if self.centroids is None:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate([self.lists[i] for i in probe])
+        if not len(candidates):
+            return []
+        candidates.sort()
+        scores = np.asarray(self.store.matrix[candidates], dtype=np.float32) @ query
+        return top_k(scores, candidates, k)
+
+
+def load_ann_index(store, kind=ANN_INDEX):
+    """The configured index over store: "ivf" (exact below ANN_MIN_ROWS) or "exact" """
+    if kind == "exact" or len(store) < ANN_MIN_ROWS:
+        return ExactIndex(store)
+    if kind == "ivf":
+        return IVFIndex.load_or_build(store)
+    raise ValueError(f"Unknown ANN_INDEX {kind!r}; expected 'ivf' or 'exact'")
@@ -1,20 +1,17 @@
 import streamlit as st
-from mistralai.client import MistralClient
-from mistralai.models.chat_completion import ChatMessage
 import os
-from dotenv import load_dotenv
-import requests
 import sys
+import uuid
+from chat_service import get_service
+from mistral_client import run_sync
 
 # Print debug information
 print(f"Python version: {sys.version}")
 print(f"Python path: {sys.executable}")
 
-# Load environment variables
-load_dotenv()
-
-# Initialize Mistral AI client
-client = MistralClient(api_key=os.getenv("MISTRAL_API_KEY"))
+# Same chat core as the web servers (imported once, so it survives Streamlit reruns)
+service = get_service()
+service.start()
 
 # Get API key and print debug info (without showing the full key)
 api_key = os.getenv("MISTRAL_API_KEY")
@@ -174,6 +171,9 @@ st.markdown("""
 # Initialize chat history
 if "messages" not in st.session_state:
     st.session_state.messages = []
+# The service keeps the conversation history under this id
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # Display header with animated icon
 st.markdown('<div class="support-header">', unsafe_allow_html=True)
@@ -217,16 +217,8 @@ if prompt := st.chat_input("How can I help you with Souqcoom's services?"):
     # Get AI response with animated loading
     with st.chat_message("assistant"):
         with st.spinner("✨ Finding the best answer for you..."):
-            messages = [
-                ChatMessage(role=m["role"], content=m["content"])
-                for m in st.session_state.messages
-            ]
-            response = client.chat(
-                model="mistral-small-latest",
-                messages=messages,
-                temperature=0.7,
-            )
-            response_content = response.choices[0].message.content
+            result = run_sync(service.answer(prompt, session_id=st.session_state.session_id))
+            response_content = result.text
             st.markdown(f'<div class="chat-message assistant-message">{response_content}</div>', unsafe_allow_html=True)
 
     # Add assistant response to chat history
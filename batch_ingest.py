@@ -0,0 +1,352 @@
+"""Ingest a whole library of PDFs in one non-interactive run.
+
+Sources are PDF files, directories (searched recursively for *.pdf), URLs
+(Google Drive links go through gdown) and list files (.txt, one path or URL
+per line, # for comments). Documents flow through pipelined stages with
+bounded queues between them:
+
+    download -> [ready queue] -> extract -> [page queue] -> chunk -> generate
+
+Several documents are in flight at once. Each one is a checkpointed
+IngestJob, so an interrupted run resumes where it stopped. Per-stage
+throughput and queue depths are printed while it runs.
+
+Usage (e.g. from cron):
+
+    python batch_ingest.py policies/ sources.txt https://example.com/terms.pdf --documents 3
+"""
+import argparse
+import hashlib
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+from ingest_cache import IngestManifest
+from ingest_job import IngestJob
+from pdf_extract import PDF_EXTRACT_WORKERS
+from pdf_trainer import PDFTrainer
+from qa_pipeline import QA_BATCH_SIZE, QA_CONCURRENCY, QA_REQUESTS_PER_MINUTE
+from text_splitter import split_pages
+
+INGEST_DOWNLOAD_DIR = os.getenv("INGEST_DOWNLOAD_DIR", "pdfs/downloads")
+# Documents processed at once, and downloads running ahead of them
+INGEST_DOCUMENTS = int(os.getenv("INGEST_DOCUMENTS", "2"))
+INGEST_DOWNLOADERS = int(os.getenv("INGEST_DOWNLOADERS", "2"))
+# Extracted pages buffered per document ahead of chunking and generation
+PAGE_QUEUE_SIZE = int(os.getenv("INGEST_PAGE_QUEUE", "32"))
+
+_DONE = object()
+
+
+class StageStats:
+    """Thread-safe item counters per stage, with rates since the run started"""
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.counts = {stage: 0 for stage in stages}
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def add(self, stage, amount=1):
+        with self.lock:
+            self.counts[stage] += amount
+
+    def counted(self, stage, items):
+        """Pass items through, counting each one under stage"""
+        for item in items:
+            self.add(stage)
+            yield item
+
+    def line(self, queues):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        with self.lock:
+            counts = dict(self.counts)
+        parts = [f"{stage} {count} ({count / elapsed:.1f}/s)" for stage, count in counts.items()]
+        parts += [f"{name} queue {depth()}" for name, depth in queues.items()]
+        return " | ".join(parts)
+
+
+def expand_sources(sources):
+    """PDF paths and URLs from files, directories, URLs and list files, without duplicates"""
+    found, seen = [], set()
+
+    def add(item):
+        if item not in seen:
+            seen.add(item)
+            found.append(item)
+
+    for source in sources:
+        if re.match(r"https?://", source):
+            add(source)
+        elif os.path.isdir(source):
+            for root, _, names in os.walk(source):
+                for name in sorted(names):
+                    if name.lower().endswith(".pdf"):
+                        add(os.path.join(root, name))
+        elif source.lower().endswith(".pdf"):
+            add(source)
+        elif os.path.isfile(source):
+            with open(source, 'r', encoding='utf-8') as f:
+                listed = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+            for item in expand_sources(listed):
+                add(item)
+        else:
+            print(f"Skipping {source}: not a PDF, directory, list file or URL")
+    return found
+
+
+def download(url, download_dir=INGEST_DOWNLOAD_DIR, refresh=False):
+    """Fetch url into download_dir (once, unless refresh) and return the local path"""
+    parsed = urlparse(url)
+    name = os.path.splitext(os.path.basename(unquote(parsed.path)))[0] or parsed.netloc
+    name = re.sub(r"[^\w.-]+", "_", name)
+    path = os.path.join(download_dir, f"{name}-{hashlib.sha256(url.encode('utf-8')).hexdigest()[:12]}.pdf")
+    if os.path.exists(path) and not refresh:
+        return path
+
+    os.makedirs(download_dir, exist_ok=True)
+    tmp_path = path + ".part"
+    try:
+        if "drive.google.com" in parsed.netloc:
+            import gdown
+
+            if not gdown.download(url, tmp_path, quiet=True, fuzzy=True):
+                raise ValueError("Google Drive download failed")
+        else:
+            import requests
+
+            with requests.get(url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    for block in response.iter_content(chunk_size=1 << 16):
+                        f.write(block)
+        with open(tmp_path, 'rb') as f:
+            if f.read(5) != b'%PDF-':
+                raise ValueError("Downloaded file is not a PDF")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def prefetch(items, maxsize, depths):
+    """Iterate items on a background thread, at most maxsize ahead of the consumer"""
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up once the consumer has gone away, instead of blocking forever
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fill():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    thread = threading.Thread(target=fill, daemon=True)
+    depths.append(buffer)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        depths.remove(buffer)
+
+
+class BatchIngest:
+    def __init__(self, trainer, documents=INGEST_DOCUMENTS, downloaders=INGEST_DOWNLOADERS,
+                 concurrency=QA_CONCURRENCY, embed=False, refresh=False, output_file=None):
+        self.trainer = trainer
+        self.documents = max(1, documents)
+        self.downloaders = max(1, downloaders)
+        self.concurrency = concurrency
+        self.embed = embed
+        self.refresh = refresh
+        self.output_file = output_file
+        self.manifest = IngestManifest()
+        self.stats = StageStats(("downloaded", "pages", "chunks", "generated", "documents"))
+        self.ready = queue.Queue(maxsize=self.documents)
+        self.page_queues = []
+        self.failures = []
+        self.examples = 0
+        self.added = 0
+        # The vector store and ANN index are not safe to update from two threads
+        self.embed_lock = threading.Lock()
+        self.lock = threading.Lock()
+
+    def queue_depths(self):
+        return {
+            "ready": self.ready.qsize,
+            "page": lambda: sum(q.qsize() for q in list(self.page_queues)),
+        }
+
+    def _download_stage(self, sources, next_source):
+        while True:
+            with self.lock:
+                if next_source[0] >= len(sources):
+                    return
+                source = sources[next_source[0]]
+                next_source[0] += 1
+            try:
+                path = download(source, refresh=self.refresh) if re.match(r"https?://", source) else source
+                self.stats.add("downloaded")
+                self.ready.put((source, path))
+            except Exception as e:
+                print(f"Download failed for {source}: {str(e)}")
+                with self.lock:
+                    self.failures.append((source, f"download: {str(e)}"))
+
+    def _document_stage(self):
+        extract_workers = max(1, PDF_EXTRACT_WORKERS // self.documents)
+        while True:
+            item = self.ready.get()
+            if item is _DONE:
+                return
+            source, path = item
+            try:
+                self.ingest(path, extract_workers)
+                self.stats.add("documents")
+            except Exception as e:
+                print(f"Ingestion failed for {source}: {str(e)}")
+                with self.lock:
+                    self.failures.append((source, str(e)))
+
+    def ingest(self, path, extract_workers):
+        job = IngestJob(path, manifest=self.manifest)
+        pages = prefetch(
+            self.stats.counted("pages", self.manifest.iter_text(path, max_workers=extract_workers)),
+            PAGE_QUEUE_SIZE,
+            self.page_queues,
+        )
+        chunks = self.stats.counted("chunks", split_pages(pages))
+        results = job.run(
+            self.trainer.generate_qa_pairs,
+            generate_batch=self.trainer.generate_qa_pairs_batch,
+            chunks=chunks,
+            batch_size=self.trainer.batch_size,
+            max_workers=self.concurrency,
+            on_result=lambda i, qa_pairs: self.stats.add("generated"),
+        )
+        if not results:
+            raise Exception("No text could be extracted")
+
+        if self.embed:
+            pairs = [pair for qa_pairs in results for pair in qa_pairs]
+            with self.embed_lock:
+                try:
+                    self.trainer.embed_pdf(path, split_pages(self.manifest.iter_text(path)), pairs)
+                except ImportError as e:
+                    print(f"Skipping embeddings ({str(e)})")
+
+        examples, added = job.compact(self.output_file) if self.output_file else job.compact()
+        with self.lock:
+            self.examples += examples
+            self.added += added
+        print(f"Ingested {path}: {len(results)} chunks, {examples} examples ({added} new)")
+
+    def run(self, sources, report_interval=10.0):
+        next_source = [0]
+        downloaders = [
+            threading.Thread(target=self._download_stage, args=(sources, next_source), daemon=True)
+            for _ in range(min(self.downloaders, len(sources)))
+        ]
+        workers = [threading.Thread(target=self._document_stage, daemon=True) for _ in range(self.documents)]
+        for thread in downloaders + workers:
+            thread.start()
+
+        def close_ready():
+            for thread in downloaders:
+                thread.join()
+            for _ in workers:
+                self.ready.put(_DONE)
+
+        threading.Thread(target=close_ready, daemon=True).start()
+
+        finished = threading.Event()
+
+        def report():
+            while not finished.wait(report_interval):
+                print(f"[progress] {self.stats.line(self.queue_depths())}")
+
+        threading.Thread(target=report, daemon=True).start()
+        try:
+            for thread in workers:
+                while thread.is_alive():
+                    thread.join(0.5)
+        finally:
+            finished.set()
+            self.manifest.save()
+
+        elapsed = time.perf_counter() - self.stats.start
+        print(f"\n[done] {self.stats.line(self.queue_depths())}")
+        print(
+            f"{self.stats.counts['documents']}/{len(sources)} documents in {elapsed:.1f}s, "
+            f"{self.examples} examples ({self.added} new)"
+        )
+        for source, error in self.failures:
+            print(f"FAILED {source}: {error}")
+        return not self.failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="PDF files, directories, URLs or list files")
+    parser.add_argument("--documents", type=int, default=INGEST_DOCUMENTS, help="documents processed at once")
+    parser.add_argument("--downloaders", type=int, default=INGEST_DOWNLOADERS, help="parallel downloads")
+    parser.add_argument("--concurrency", type=int, default=QA_CONCURRENCY, help="Mistral requests per document")
+    parser.add_argument("--requests-per-minute", type=int, default=QA_REQUESTS_PER_MINUTE,
+                        help="upstream budget shared by all documents")
+    parser.add_argument("--batch-size", type=int, default=QA_BATCH_SIZE, help="chunks per Q&A request")
+    parser.add_argument("--embed", action="store_true", help="also embed chunks and pairs into the vector store")
+    parser.add_argument("--refresh", action="store_true", help="download URLs again even if already present")
+    parser.add_argument("--output", help="training file (default training_data/training_examples.jsonl)")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    sources = expand_sources(args.sources)
+    if not sources:
+        print("No PDFs found")
+        return 1
+    print(f"Ingesting {len(sources)} documents, {args.documents} at a time")
+
+    # One connection pool and rate limit shared by every document
+    trainer = PDFTrainer(
+        concurrency=args.concurrency * max(1, args.documents),
+        requests_per_minute=args.requests_per_minute,
+        batch_size=args.batch_size,
+    )
+    ingest = BatchIngest(
+        trainer,
+        documents=args.documents,
+        downloaders=args.downloaders,
+        concurrency=args.concurrency,
+        embed=args.embed,
+        refresh=args.refresh,
+        output_file=args.output,
+    )
+    return 0 if ingest.run(sources, report_interval=args.report_interval) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Recall and latency of the IVF index against exact search.
+
+Builds a vector store of synthetic clustered embeddings (or opens an existing
+one with --store), trains an IVF index over it and, for each nprobe, reports
+recall@k against brute-force search and the mean and p95 query time.
+
+Usage (from the repository root):
+
+    python benchmarks/ann_recall.py --rows 50000 --dim 384 --k 5 --nprobe 1 4 8 16 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import ExactIndex, IVFIndex  # noqa: E402
+from vector_store import VectorStore  # noqa: E402
+
+
+def normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_store(path, rows, dim, dtype, clusters=200, seed=0):
+    """Clustered unit vectors, roughly what sentence embeddings of many documents look like"""
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((clusters, dim)).astype(np.float32))
+    store = VectorStore(path, dtype=dtype, model="synthetic")
+    for start in range(0, rows, 10000):
+        count = min(10000, rows - start)
+        vectors = centers[rng.integers(clusters, size=count)] + 0.08 * rng.standard_normal((count, dim)).astype(np.float32)
+        store.append([f"row{i}" for i in range(start, start + count)], normalize(vectors))
+    return store
+
+
+def timed_search(index, queries, k, **options):
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([row for _, row in index.search(query, k=k, **options)])
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return results, np.mean(timings) * 1000, timings[int(len(timings) * 0.95)] * 1000
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.store:
+            store = VectorStore(args.store)
+        else:
+            start = time.perf_counter()
+            store = synthetic_store(os.path.join(workdir, "vectors"), args.rows, args.dim, args.dtype)
+            print(f"Built synthetic store: {len(store)} x {store.dim} {store.dtype.name} "
+                  f"in {time.perf_counter() - start:.1f}s")
+
+        rng = np.random.default_rng(1)
+        # Queries are perturbed store rows, like a paraphrased question
+        sample = np.asarray(store.matrix[rng.choice(len(store), size=args.queries, replace=False)], dtype=np.float32)
+        queries = normalize(sample + 0.05 * rng.standard_normal(sample.shape).astype(np.float32))
+
+        exact, exact_mean, exact_p95 = timed_search(ExactIndex(store), queries, args.k)
+        print(f"{'exact':>12}  recall@{args.k} 1.000  mean {exact_mean:7.2f}ms  p95 {exact_p95:7.2f}ms")
+
+        index = IVFIndex(store, nlist=args.nlist)
+        index.train()
+        for nprobe in args.nprobe:
+            approx, mean, p95 = timed_search(index, queries, args.k, nprobe=nprobe)
+            recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact)])
+            print(f"{'nprobe=' + str(nprobe):>12}  recall@{args.k} {recall:.3f}  mean {mean:7.2f}ms  p95 {p95:7.2f}ms  "
+                  f"({exact_mean / mean:.1f}x faster)")
+
+        # Incremental inserts: new rows are searchable after sync() without retraining
+        if not args.store:
+            extra = normalize(rng.standard_normal((1000, store.dim)).astype(np.float32))
+            store.append([f"extra{i}" for i in range(len(extra))], extra)
+            start = time.perf_counter()
+            added = index.sync()
+            found = np.mean([index.search(v, k=1, nprobe=args.nprobe[-1])[0][1] == len(store) - len(extra) + i
+                             for i, v in enumerate(extra[:100])])
+            print(f"\nsync() added {added} rows in {(time.perf_counter() - start) * 1000:.1f}ms; "
+                  f"{found * 100:.0f}% of inserted rows are their own nearest neighbour")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", help="existing vector store path (default: synthetic data)")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 picks about 4 * sqrt(rows))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    main(parser.parse_args())
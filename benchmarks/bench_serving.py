@@ -0,0 +1,238 @@
+"""Benchmark suite for the chat serving path.
+
+Starts a local fake Mistral server, boots each entry point (main:app, api:app,
+web_app:app) under gunicorn with every requested worker count, and drives /chat
+with a concurrent load generator. Reports p50/p95/p99 latency, throughput and
+error rate, saves the run under benchmarks/results/ and compares it with the
+previous run of the same configuration.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_serving.py --apps main api web_app --workers 1 4 \\
+        --concurrency 16 --requests 400 --latency 0.2 --rate-429 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+HISTORY_FILE = os.path.join(RESULTS_DIR, "history.jsonl")
+
+# How each entry point is served in production
+APPS = {
+    "main": ["-k", "uvicorn.workers.UvicornWorker", "main:app"],
+    "api": ["-k", "uvicorn.workers.UvicornWorker", "api:app"],
+    "web_app": ["-k", "uvicorn.workers.UvicornWorker", "web_app:app"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited early with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+def start_process(args, env, health_url):
+    process = subprocess.Popen(
+        args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_ready(health_url, process)
+    except Exception:
+        process.kill()
+        raise
+    return process
+
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def start_fake_mistral(args):
+    port = free_port()
+    env = dict(
+        os.environ,
+        FAKE_MISTRAL_LATENCY=str(args.latency),
+        FAKE_MISTRAL_429_RATE=str(args.rate_429),
+        FAKE_MISTRAL_RETRY_AFTER=str(args.retry_after),
+    )
+    process = start_process(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_mistral:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env,
+        f"http://127.0.0.1:{port}/docs",
+    )
+    return process, f"http://127.0.0.1:{port}/v1/chat/completions"
+
+
+def start_app(name, workers, endpoint):
+    port = free_port()
+    env = dict(os.environ, MISTRAL_API_ENDPOINT=endpoint, MISTRAL_API_KEY="fake-key")
+    process = start_process(
+        [sys.executable, "-m", "gunicorn", "-b", f"127.0.0.1:{port}", "-w", str(workers),
+         "--timeout", "120", *APPS[name]],
+        env,
+        f"http://127.0.0.1:{port}/health",
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def drive(base_url, total, concurrency):
+    """Send total unique questions to /chat with concurrency requests in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    run_id = uuid.uuid4().hex[:8]
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=130, limits=limits) as client:
+
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                # Unique questions and sessions, so caches and history do not skew results
+                start = time.perf_counter()
+                try:
+                    response = await client.post(
+                        "/chat",
+                        json={"message": f"Benchmark question {run_id}-{i}", "language": "en"},
+                        headers={"X-Session-ID": f"{run_id}-{i}"},
+                    )
+                    ok = response.status_code == 200 and "Fake answer" in response.text
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "error_rate": round(errors / total, 4),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def previous_results():
+    """Latest stored result per (app, workers, concurrency)"""
+    latest = {}
+    if os.path.exists(HISTORY_FILE):
+        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    latest[(result["app"], result["workers"], result["concurrency"])] = result
+    return latest
+
+
+def delta(current, previous, key):
+    if not previous or not previous.get(key):
+        return ""
+    change = (current[key] - previous[key]) / previous[key] * 100
+    return f" ({change:+.0f}%)"
+
+
+def main(args):
+    previous = previous_results()
+    revision = git_revision()
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    results = []
+
+    fake_process, endpoint = start_fake_mistral(args)
+    try:
+        for name in args.apps:
+            for workers in args.workers:
+                app_process, base_url = start_app(name, workers, endpoint)
+                try:
+                    for concurrency in args.concurrency:
+                        result = asyncio.run(drive(base_url, args.requests, concurrency))
+                        result.update(
+                            app=name, workers=workers, revision=revision, timestamp=timestamp,
+                            upstream_latency=args.latency, rate_429=args.rate_429,
+                        )
+                        results.append(result)
+                        before = previous.get((name, workers, concurrency))
+                        print(
+                            f"{name:>8} w={workers:<2} c={concurrency:<4} "
+                            f"{result['throughput_rps']:>8.1f} req/s{delta(result, before, 'throughput_rps')}  "
+                            f"p50 {result['p50_ms']:>7.1f}ms{delta(result, before, 'p50_ms')}  "
+                            f"p95 {result['p95_ms']:>7.1f}ms  p99 {result['p99_ms']:>7.1f}ms{delta(result, before, 'p99_ms')}  "
+                            f"errors {result['error_rate'] * 100:.1f}%"
+                        )
+                finally:
+                    stop_process(app_process)
+    finally:
+        stop_process(fake_process)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(os.path.join(RESULTS_DIR, f"{timestamp}-{revision}.json"), "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+        print(f"\nSaved {len(results)} results to {RESULTS_DIR}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", nargs="+", choices=sorted(APPS), default=sorted(APPS))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake upstream latency in seconds")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of upstream calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--no-save", action="store_true", help="print results without storing them")
+    main(parser.parse_args())
@@ -0,0 +1,97 @@
+"""Local stand-in for the Mistral chat completions API.
+
+Run it with `uvicorn benchmarks.fake_mistral:app --port 9100` and point the
+apps at it with MISTRAL_API_ENDPOINT=http://127.0.0.1:9100/v1/chat/completions.
+
+Latency is configurable with FAKE_MISTRAL_LATENCY (seconds before the first
+token) and FAKE_MISTRAL_TOKEN_LATENCY (seconds between streamed tokens).
+FAKE_MISTRAL_429_RATE (0-1) answers that fraction of requests with a 429 and
+a Retry-After of FAKE_MISTRAL_RETRY_AFTER seconds.
+
+Q&A generation prompts get 3 JSON pairs per text: one per line for a single
+chunk, or a JSON object keyed by text id for a batched request.
+FAKE_MISTRAL_DROP_RATE (0-1) leaves that fraction of ids out of batched replies.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FAKE_LATENCY = float(os.getenv("FAKE_MISTRAL_LATENCY", "0.2"))
+FAKE_TOKEN_LATENCY = float(os.getenv("FAKE_MISTRAL_TOKEN_LATENCY", "0.02"))
+FAKE_429_RATE = float(os.getenv("FAKE_MISTRAL_429_RATE", "0"))
+FAKE_RETRY_AFTER = os.getenv("FAKE_MISTRAL_RETRY_AFTER", "1")
+FAKE_DROP_RATE = float(os.getenv("FAKE_MISTRAL_DROP_RATE", "0"))
+
+TEXT_ID = re.compile(r'<text id="([^"]+)">')
+
+app = FastAPI(title="Fake Mistral API")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    if FAKE_429_RATE and random.random() < FAKE_429_RATE:
+        return JSONResponse(
+            {"message": "Requests rate limit exceeded"},
+            status_code=429,
+            headers={"Retry-After": FAKE_RETRY_AFTER},
+        )
+    await asyncio.sleep(FAKE_LATENCY)
+
+    question = payload["messages"][-1]["content"]
+    content = qa_content(payload, question) or f"Fake answer to: {question[:80]}"
+    if payload.get("stream"):
+        return StreamingResponse(stream_tokens(payload, content), media_type="text/event-stream")
+    return {
+        "id": f"fake-{time.time_ns()}",
+        "object": "chat.completion",
+        "model": payload.get("model", "mistral-small-latest"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": sum(len(m["content"].split()) for m in payload["messages"]),
+            "completion_tokens": len(content.split()),
+            "total_tokens": 0,
+        },
+    }
+
+
+def fake_pairs(label):
+    return [
+        {"question": f"What does {label} say about item {n}?", "answer": f"It describes item {n} of {label}."}
+        for n in range(1, 4)
+    ]
+
+
+def qa_content(payload, prompt):
+    """Reply to a Q&A generation prompt, or None for a chat question"""
+    if "question-answer pairs" not in prompt:
+        return None
+    if (payload.get("response_format") or {}).get("type") == "json_object":
+        ids = [i for i in TEXT_ID.findall(prompt) if random.random() >= FAKE_DROP_RATE]
+        return json.dumps({i: fake_pairs(f"text {i}") for i in ids})
+    return "\n".join(json.dumps(pair) for pair in fake_pairs("the text"))
+
+
+async def stream_tokens(payload, content):
+    for i, token in enumerate(content.split(" ")):
+        if i:
+            await asyncio.sleep(FAKE_TOKEN_LATENCY)
+        chunk = {
+            "object": "chat.completion.chunk",
+            "model": payload.get("model", "mistral-small-latest"),
+            "choices": [{"index": 0, "delta": {"content": token if i == 0 else " " + token}}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
@@ -0,0 +1,89 @@
+"""Cold start benchmark for the PDF training tools.
+
+Imports each module in a fresh interpreter with -X importtime, reports the
+total import time in milliseconds and the slowest imports, and times creating
+a PDFTrainer (which must not load the embedding model).
+
+Usage (from the repository root):
+
+    python benchmarks/import_time.py --modules pdf_trainer download_and_process --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONSTRUCT_SNIPPET = """
+import time
+start = time.perf_counter()
+from pdf_trainer import PDFTrainer
+trainer = PDFTrainer()
+elapsed = time.perf_counter() - start
+assert trainer.embedder._model is None, "PDFTrainer loaded the embedding model eagerly"
+print(f"{elapsed * 1000:.1f}")
+"""
+
+
+def import_profile(module):
+    """(total microseconds, [(cumulative microseconds, name)]) for importing module once"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.splitlines()[-1]}")
+
+    entries, total = [], 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        cumulative, name = int(cumulative), name.rstrip()
+        # Everything up to site is interpreter startup, not the module being measured
+        if name == " site":
+            entries = []
+            continue
+        # The requested module is the only entry with a single leading space
+        if name == f" {module}":
+            total = cumulative
+        entries.append((cumulative, name.strip()))
+    return total, entries
+
+
+def construct_time(workdir):
+    env = dict(os.environ, MISTRAL_API_KEY=os.getenv("MISTRAL_API_KEY") or "fake-key", PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-c", CONSTRUCT_SNIPPET], cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Creating PDFTrainer failed:\n{result.stderr}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main(args):
+    for module in args.modules:
+        totals, entries = [], []
+        for _ in range(args.runs):
+            total, entries = import_profile(module)
+            totals.append(total / 1000)
+        print(f"import {module}: median {statistics.median(totals):.1f}ms "
+              f"(min {min(totals):.1f}ms, max {max(totals):.1f}ms over {args.runs} runs)")
+        for cumulative, name in sorted(entries, reverse=True)[1:args.top + 1]:
+            print(f"    {cumulative / 1000:8.1f}ms  {name}")
+
+    # PDFTrainer creates training_data/ and pdfs/, so run it somewhere disposable
+    with tempfile.TemporaryDirectory() as workdir:
+        timings = [construct_time(workdir) for _ in range(args.runs)]
+    print(f"import + PDFTrainer(): median {statistics.median(timings):.1f}ms, embedding model not loaded")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["pdf_trainer"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="number of slowest imports to list")
+    main(parser.parse_args())
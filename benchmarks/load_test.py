@@ -0,0 +1,153 @@
+"""Load test for main.py /chat against a local fake Mistral server.
+
+Usage (from the repository root):
+
+    python benchmarks/load_test.py --requests 200 --concurrency 1 4 16 64
+
+With a fixed upstream latency, throughput should grow roughly linearly with
+concurrency until MISTRAL_MAX_CONCURRENCY is reached.
+
+Pass --stream to drive /chat/stream instead and report time-to-first-token
+(TTFT) alongside total latency.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app):
+    """Serve an ASGI app with uvicorn on a background thread; return (base_url, server)"""
+    port = _free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def start_fake_mistral(latency, token_latency=0.02):
+    """Start benchmarks/fake_mistral.py on a background thread and return its endpoint"""
+    os.environ["FAKE_MISTRAL_LATENCY"] = str(latency)
+    os.environ["FAKE_MISTRAL_TOKEN_LATENCY"] = str(token_latency)
+    from benchmarks.fake_mistral import app as fake_app
+
+    base_url, server = start_server(fake_app)
+    return f"{base_url}/v1/chat/completions", server
+
+
+def question(run_id, i):
+    # Unique per level and run, so no request is answered from the response cache
+    return {"message": f"Question {run_id}-{i}", "language": "en"}
+
+
+async def run_level(client, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    run_id = uuid.uuid4().hex[:8]
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            response = await client.post("/chat", json=question(run_id, i))
+            if response.status_code != 200 or "Fake answer" not in response.json().get("response", ""):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    return total / elapsed, elapsed, errors
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_stream_level(client, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    run_id = uuid.uuid4().hex[:8]
+    ttfts, latencies = [], []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            first = None
+            body = ""
+            async with client.stream("POST", "/chat/stream", json=question(run_id, i)) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("data:") and '"delta"' in line:
+                        if first is None:
+                            first = time.perf_counter() - start
+                        body += line
+            if first is None or "Fake" not in body:
+                errors += 1
+                return
+            ttfts.append(first)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    return total / elapsed, ttfts, latencies, errors
+
+
+async def main(args):
+    endpoint, server = start_fake_mistral(args.latency, args.token_latency)
+    os.environ["MISTRAL_API_ENDPOINT"] = endpoint
+    os.environ.setdefault("MISTRAL_API_KEY", "fake-key")
+
+    import main as chat_app
+
+    # A real socket, so streamed events are timed as a browser would see them
+    base_url, app_server = start_server(chat_app.app)
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        if args.stream:
+            print(f"{'concurrency':>12} {'req/s':>9} {'ttft p50':>9} {'ttft p95':>9} {'total p50':>10} {'errors':>7}")
+            for level in args.concurrency:
+                rps, ttfts, latencies, errors = await run_stream_level(client, args.requests, level)
+                print(f"{level:>12} {rps:>9.1f} {percentile(ttfts, 50) * 1000:>7.0f}ms "
+                      f"{percentile(ttfts, 95) * 1000:>7.0f}ms {percentile(latencies, 50) * 1000:>8.0f}ms {errors:>7}")
+            app_server.should_exit = True
+            server.should_exit = True
+            return
+
+        print(f"{'concurrency':>12} {'requests':>9} {'seconds':>9} {'req/s':>9} {'errors':>7}")
+        for level in args.concurrency:
+            rps, elapsed, errors = await run_level(client, args.requests, level)
+            print(f"{level:>12} {args.requests:>9} {elapsed:>9.2f} {rps:>9.1f} {errors:>7}")
+
+    app_server.should_exit = True
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--latency", type=float, default=0.2, help="fake upstream latency in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="fake delay between streamed tokens")
+    parser.add_argument("--stream", action="store_true", help="benchmark /chat/stream and report TTFT")
+    asyncio.run(main(parser.parse_args()))
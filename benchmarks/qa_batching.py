@@ -0,0 +1,134 @@
+"""Requests per chunk and tokens per Q&A pair, with and without batched Q&A generation.
+
+Starts a local fake Mistral server and runs process_local_pdf's Q&A generation
+over the same chunks once per batch size. Token counts come from the fake
+server's usage field (words, not real tokens), so compare runs with each
+other rather than with production numbers.
+
+Usage (from the repository root):
+
+    python benchmarks/qa_batching.py --batch-sizes 1 4 8 --chunks 200
+    python benchmarks/qa_batching.py --pdf pdfs/downloaded.pdf --drop-rate 0.1
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_serving import free_port, start_process, stop_process  # noqa: E402
+
+WORDS = "order shipping refund payment seller buyer account delivery return warranty invoice".split()
+
+
+def synthetic_pages(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "\n\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))) for _ in range(5))
+
+
+def load_chunks(args):
+    from text_splitter import split_pages
+
+    if args.pdf:
+        from pdf_extract import iter_pages
+
+        pages = (text for _, text in iter_pages(args.pdf))
+    else:
+        pages = synthetic_pages(args.chunks)
+    chunks = []
+    for chunk in split_pages(pages):
+        chunks.append(chunk)
+        if len(chunks) >= args.chunks:
+            break
+    return chunks
+
+
+def reset_metrics(metrics):
+    for metric in metrics.METRICS:
+        metric.values.clear()
+
+
+def total(counter, endpoint):
+    return sum(value for key, value in counter.values.items() if endpoint in key)
+
+
+def run(chunks, batch_size, concurrency):
+    import metrics
+    import process_local_pdf
+    from qa_pipeline import create_session, generate_in_batches
+    from rate_limiter import TokenBucket
+
+    reset_metrics(metrics)
+    session = create_session(concurrency)
+    limiter = TokenBucket(100000, burst=concurrency)
+    headers = {"Authorization": "Bearer fake-key", "Content-Type": "application/json"}
+
+    start = time.perf_counter()
+    results = generate_in_batches(
+        chunks,
+        lambda batch: process_local_pdf.generate_batch_pairs(batch, session, headers, limiter),
+        lambda chunk: process_local_pdf.generate_chunk_pairs(chunk, session, headers, limiter),
+        batch_size=batch_size,
+        max_workers=concurrency,
+    )
+    elapsed = time.perf_counter() - start
+
+    endpoint = "process_local_pdf"
+    requests = total(metrics.UPSTREAM_REQUESTS, endpoint)
+    tokens = total(metrics.PROMPT_TOKENS, endpoint) + total(metrics.COMPLETION_TOKENS, endpoint)
+    pairs = sum(len(qa_pairs) for qa_pairs in results)
+    return {
+        "batch_size": batch_size,
+        "requests": requests,
+        "requests_per_chunk": requests / len(chunks),
+        "tokens_per_pair": tokens / pairs if pairs else 0.0,
+        "chunks_without_pairs": sum(1 for qa_pairs in results if not qa_pairs),
+        "seconds": elapsed,
+    }
+
+
+def main(args):
+    port = free_port()
+    env = dict(
+        os.environ,
+        FAKE_MISTRAL_LATENCY=str(args.latency),
+        FAKE_MISTRAL_DROP_RATE=str(args.drop_rate),
+    )
+    server = start_process(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_mistral:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env,
+        f"http://127.0.0.1:{port}/docs",
+    )
+    # qa_pipeline reads the endpoint at import time
+    os.environ["MISTRAL_API_ENDPOINT"] = f"http://127.0.0.1:{port}/v1/chat/completions"
+    try:
+        chunks = load_chunks(args)
+        print(f"{len(chunks)} chunks, {args.concurrency} requests in flight")
+        rows = [run(chunks, batch_size, args.concurrency) for batch_size in args.batch_sizes]
+    finally:
+        stop_process(server)
+
+    print()
+    print(f"{'batch':>5} {'requests':>9} {'req/chunk':>9} {'tokens/pair':>11} {'no pairs':>8} {'seconds':>8}")
+    for row in rows:
+        print(
+            f"{row['batch_size']:>5} {row['requests']:>9} {row['requests_per_chunk']:>9.2f} "
+            f"{row['tokens_per_pair']:>11.1f} {row['chunks_without_pairs']:>8} {row['seconds']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--chunks", type=int, default=200, help="chunks to generate for (synthetic pages or --pdf)")
+    parser.add_argument("--pdf", help="take chunks from this PDF instead of synthetic text")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake upstream latency in seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of chunks left out of batched replies")
+    main(parser.parse_args())
@@ -0,0 +1,142 @@
+"""Parsing success rate of Q&A model output: the shared extractor against the old line parsers.
+
+Reads a JSONL corpus of replies. benchmarks/qa_corpus.jsonl is a hand-written
+seed in the shapes the model produces (JSON lines, arrays, fences, pretty
+printing, truncation, batches). Real replies can be recorded by running the
+PDF tools with QA_RECORD_RESPONSES=path.jsonl. Entries with an "expected"
+pair count are scored against it; recorded ones against 3 pairs per chunk.
+
+Usage (from the repository root):
+
+    python benchmarks/qa_parsing.py
+    python benchmarks/qa_parsing.py --corpus recorded.jsonl --verbose
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_CORPUS = os.path.join(ROOT, "benchmarks", "qa_corpus.jsonl")
+PAIRS_PER_CHUNK = 3
+
+
+def line_parser(content):
+    """Old PDFTrainer.generate_qa_pairs: whole lines that start with { and end with }"""
+    pairs = []
+    try:
+        for line in content.split('\n'):
+            line = line.strip()
+            if line and line.startswith('{') and line.endswith('}'):
+                pair = json.loads(line)
+                if 'question' in pair and 'answer' in pair:
+                    pairs.append(pair)
+    except json.JSONDecodeError:
+        pass
+    return pairs
+
+
+def line_joiner(content):
+    """Old process_local_pdf.parse_qa_pairs: joins lines from { to }, strips fences"""
+    joined, current = [], ""
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line or line in ('```json', '```'):
+            continue
+        line = line.strip('`')
+        if line.startswith('{'):
+            current = line
+            if line.endswith('}'):
+                joined.append(current)
+                current = ""
+        elif line.endswith('}') and current:
+            joined.append(current + line)
+            current = ""
+        elif current:
+            current += line
+    pairs = []
+    for line in joined:
+        try:
+            pair = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if 'question' in pair and 'answer' in pair:
+            pairs.append(pair)
+    return pairs
+
+
+def whole_object(content, count):
+    """Old parse_batch_pairs: one json.loads from the first { to the last }"""
+    start, end = content.find("{"), content.rfind("}")
+    try:
+        data = json.loads(content[start:end + 1]) if start != -1 else {}
+    except json.JSONDecodeError:
+        return 0
+    if not isinstance(data, dict):
+        return 0
+    return sum(
+        len([p for p in data.get(str(i)) if isinstance(p, dict) and "question" in p and "answer" in p])
+        for i in range(1, count + 1) if isinstance(data.get(str(i)), list)
+    )
+
+
+def shared_single(content):
+    from qa_pipeline import parse_qa_pairs
+
+    return len(parse_qa_pairs(content, endpoint="benchmark"))
+
+
+def shared_batch(content, count):
+    from qa_pipeline import parse_batch_pairs
+
+    return sum(len(pairs or []) for pairs in parse_batch_pairs(content, count, endpoint="benchmark"))
+
+
+PARSERS = {
+    "line parser (old pdf_trainer)": (lambda c: len(line_parser(c)), whole_object),
+    "line joiner (old process_local_pdf)": (lambda c: len(line_joiner(c)), whole_object),
+    "shared extractor": (shared_single, shared_batch),
+}
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(args):
+    os.environ.pop("QA_RECORD_RESPONSES", None)
+    entries = load(args.corpus)
+    print(f"{len(entries)} replies from {args.corpus}\n")
+    print(f"{'parser':<38} {'pairs':>7} {'success':>8} {'perfect':>8} {'us/reply':>9}")
+    for name, (single, batch) in PARSERS.items():
+        recovered = expected = perfect = 0
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for entry in entries:
+                content = entry["content"] or ""
+                got = batch(content, entry["chunks"]) if entry.get("batched") else single(content)
+                want = entry.get("expected", PAIRS_PER_CHUNK * entry["chunks"])
+                recovered += got
+                expected += want
+                perfect += got >= want
+                if args.verbose and got < want and _ == 0:
+                    print(f"  {name}: {got}/{want} {entry.get('note', '')}")
+        elapsed = time.perf_counter() - start
+        runs = args.repeat * len(entries)
+        success = min(recovered, expected) / expected if expected else 1.0
+        print(
+            f"{name:<38} {recovered // args.repeat:>7} {success:>8.1%} {perfect / runs:>8.1%} "
+            f"{elapsed / runs * 1e6:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the corpus for the timing column")
+    parser.add_argument("--verbose", action="store_true", help="list replies a parser did not fully recover")
+    main(parser.parse_args())
@@ -0,0 +1,364 @@
+import asyncio
+import json
+import os
+import time
+from collections import namedtuple
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, FastAPI, Header, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+import metrics
+from file_utils import atomic_write_text
+from knowledge import KnowledgeBase
+from mistral_client import DEFAULT_MODEL, SSE_HEADERS, MistralAPIError, close_client, get_client, sse_event
+from response_cache import get_cache
+from retrieval import TRAINING_DATA_FILE, merge_results
+from session_store import MemorySessionStore, create_session_store
+from single_flight import SingleFlight
+
+# Load environment variables
+load_dotenv()
+
+# Retrieved passages added to the system prompt, and the reply length
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+CHAT_MAX_TOKENS = int(os.getenv("CHAT_MAX_TOKENS", "500"))
+CHAT_TEMPERATURE = 0.7
+
+UNAVAILABLE_MESSAGE = "I apologize, but I'm having trouble connecting. Please try again in a moment."
+
+# Default training data
+DEFAULT_TRAINING_DATA = {
+    "company_info": {
+        "name": "Souq.com",
+        "description": "Souq.com is the largest e-commerce platform in the Arab world.",
+        "values": ["Customer satisfaction", "Fast delivery", "Authentic products"]
+    },
+    "common_responses": {
+        "shipping": {
+            "en": "Shipping takes 2-5 business days.",
+            "ar": "يستغرق الشحن من 2 إلى 5 أيام عمل."
+        }
+    },
+    "product_categories": ["Electronics", "Fashion", "Home"],
+    "faqs": {},
+    "support_workflow": {
+        "greeting": {
+            "en": "Welcome to Souq.com support!",
+            "ar": "مرحباً بكم في دعم سوق.كوم!"
+        }
+    }
+}
+
+
+def load_training_data(strict=False):
+    try:
+        with open(TRAINING_DATA_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        # Create default training data file
+        atomic_write_text(TRAINING_DATA_FILE, json.dumps(DEFAULT_TRAINING_DATA, indent=4, ensure_ascii=False))
+        return DEFAULT_TRAINING_DATA
+    except Exception:
+        if strict:
+            raise
+        return DEFAULT_TRAINING_DATA
+
+
+# source is "faq", "cache", "mistral", "fallback" (FAQ served because Mistral failed)
+# or "unavailable" (apology)
+ChatAnswer = namedtuple("ChatAnswer", ["text", "source"])
+
+ANSWER_STATUS = {
+    "faq": "success",
+    "cache": "success",
+    "mistral": "success",
+    "fallback": "degraded",
+    "unavailable": "error",
+}
+
+
+class ChatService:
+    """The one chat serving path behind main.py, api.py, web_app.py and app.py.
+
+    Holds the process-wide Mistral pool, response cache, session store,
+    single-flight table and knowledge snapshot. With a session id, earlier
+    turns of that conversation are sent along; a question without history
+    can use the FAQ fast path, the response cache and request coalescing.
+    """
+
+    def __init__(self, client=None, cache=None, sessions=None, knowledge=None):
+        self.client = client or get_client()
+        self.cache = cache or get_cache()
+        self.sessions = sessions or create_session_store()
+        self.in_flight = SingleFlight()
+        # Snapshot rebuilt in the background whenever any worker changes the files
+        self.knowledge = knowledge or KnowledgeBase(
+            load_training_data, on_reload=[lambda snapshot: self.cache.clear()]
+        )
+        # Memory sessions are a dict lookup; sqlite and redis calls are moved off the event loop
+        self._blocking_sessions = not isinstance(self.sessions, MemorySessionStore)
+        snapshot = self.knowledge.snapshot
+        print(f"Debug: Indexed {len(snapshot.index)} knowledge passages (version {snapshot.version})")
+        if snapshot.dense_index is not None:
+            print(f"Debug: Loaded {len(snapshot.dense_index)} vectors for dense retrieval")
+
+    async def _session_call(self, method, *args):
+        if self._blocking_sessions:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def _record_turn(self, session_id, question, answer):
+        # Only completed exchanges go into the history
+        self.sessions.append(session_id, "user", question)
+        self.sessions.append(session_id, "assistant", answer)
+
+    def build_messages(self, message, language, snapshot, history=()):
+        # Ground the answer in the most relevant knowledge passages. Extra candidates are
+        # fetched because passages already in the precompiled system prompt are skipped.
+        candidates = 2 * RETRIEVAL_TOP_K
+        results = snapshot.index.search(message, k=candidates)
+        if snapshot.dense_index is not None:
+            dense_results = snapshot.dense_index.search(message, k=candidates)
+            results = merge_results(results, dense_results, k=candidates)
+
+        messages, stats = snapshot.prompts.build(message, language, results, max_passages=RETRIEVAL_TOP_K)
+        print(f"Debug: Prompt ~{stats.system_tokens + stats.user_tokens} tokens "
+              f"({stats.context_passages} passages, ~{stats.context_tokens} context tokens, "
+              f"{len(history)} history turns)")
+        # Earlier turns go between the system prompt and the new question
+        return messages[:1] + list(history) + messages[1:]
+
+    def _quick_answer(self, message, language, snapshot):
+        # FAQ fast path: no API call for known questions
+        faq = snapshot.faq_matcher.match(message, language)
+        if faq:
+            print(f"Debug: FAQ fast path hit: {faq.key} ({faq.score:.2f})")
+            return ChatAnswer(faq.answer, "faq")
+        cached = self.cache.get(message, language, DEFAULT_MODEL, version=snapshot.version)
+        if cached is not None:
+            print("Debug: Response cache hit")
+            return ChatAnswer(cached, "cache")
+        return None
+
+    def _answer_key(self, message, language, snapshot):
+        # Answers depend on the knowledge version as well as on the question
+        return self.cache.make_key(message, language, DEFAULT_MODEL, snapshot.version)
+
+    def _upstream(self, message, language, snapshot, stream, history=()):
+        """Async generator function producing one Mistral answer as deltas. Without
+        history it is run by the leader of a single-flight key, and the finished
+        answer is cached once for everyone.
+        """
+        async def produce():
+            messages = self.build_messages(message, language, snapshot, history)
+            print("Debug: Sending request to Mistral API...")
+            start = time.perf_counter()
+            if stream:
+                parts = []
+                async for delta in self.client.stream_chat(
+                        messages, temperature=CHAT_TEMPERATURE, max_tokens=CHAT_MAX_TOKENS):
+                    parts.append(delta)
+                    yield delta
+                answer = "".join(parts)
+            else:
+                answer = await self.client.chat(messages, temperature=CHAT_TEMPERATURE, max_tokens=CHAT_MAX_TOKENS)
+                yield answer
+            if not history:
+                # Keyed on the snapshot it was built from: a reload may have cleared the cache meanwhile
+                self.cache.set(message, answer, language, DEFAULT_MODEL, time.perf_counter() - start,
+                               version=snapshot.version)
+        return produce
+
+    def _fallback(self, message, language, snapshot, error):
+        """Closest FAQ answer when Mistral is unavailable, so the service degrades instead of failing"""
+        faq = snapshot.faq_matcher.fallback(message, language)
+        if faq:
+            print(f"Debug: Mistral unavailable ({str(error)}); FAQ fallback: {faq.key} ({faq.score:.2f})")
+            metrics.count_fallback("faq")
+            return faq.answer
+        metrics.count_fallback("apology")
+        return None
+
+    async def answer(self, message, language="en", session_id=None) -> ChatAnswer:
+        """Complete answer to message; never raises for upstream failures"""
+        # One snapshot for the whole request, even if a reload swaps it meanwhile
+        snapshot = self.knowledge.snapshot
+        # Unknown client languages get the English prompt, and share its cache and coalescing keys
+        language = snapshot.prompts.resolve_language(language)
+        history = await self._session_call(self.sessions.get_history, session_id) if session_id else []
+        result = None if history else self._quick_answer(message, language, snapshot)
+        if result is None:
+            try:
+                if history:
+                    produce = self._upstream(message, language, snapshot, stream=False, history=history)
+                    text = "".join([part async for part in produce()])
+                else:
+                    # Identical questions in flight share one call
+                    text = await self.in_flight.collect(
+                        self._answer_key(message, language, snapshot),
+                        self._upstream(message, language, snapshot, stream=False),
+                    )
+                result = ChatAnswer(text, "mistral")
+            except MistralAPIError as e:
+                print(f"API request failed: {str(e)}")
+                fallback = self._fallback(message, language, snapshot, e)
+                result = ChatAnswer(fallback, "fallback") if fallback else ChatAnswer(UNAVAILABLE_MESSAGE, "unavailable")
+        if session_id and result.source != "unavailable":
+            await self._session_call(self._record_turn, session_id, message, result.text)
+        return result
+
+    async def stream(self, message, language="en", session_id=None):
+        """Yield the answer to message as text deltas.
+
+        Raises MistralAPIError if Mistral fails after output has started, or
+        fails and no FAQ is close enough to answer instead.
+        """
+        snapshot = self.knowledge.snapshot
+        # Unknown client languages get the English prompt, and share its cache and coalescing keys
+        language = snapshot.prompts.resolve_language(language)
+        history = await self._session_call(self.sessions.get_history, session_id) if session_id else []
+        quick = None if history else self._quick_answer(message, language, snapshot)
+        if quick is not None:
+            parts = [quick.text]
+            yield quick.text
+        else:
+            parts = []
+            if history:
+                deltas = self._upstream(message, language, snapshot, stream=True, history=history)()
+            else:
+                # Requests joining a call already in flight first receive the deltas sent so far
+                deltas = self.in_flight.stream(
+                    self._answer_key(message, language, snapshot),
+                    self._upstream(message, language, snapshot, stream=True),
+                )
+            try:
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield delta
+            except MistralAPIError as e:
+                print(f"API stream failed: {str(e)}")
+                # A fallback can only replace the answer if nothing was streamed yet
+                fallback = self._fallback(message, language, snapshot, e) if not parts else None
+                if not fallback:
+                    raise
+                parts = [fallback]
+                yield fallback
+        if session_id:
+            await self._session_call(self._record_turn, session_id, message, "".join(parts))
+
+    def start(self):
+        self.knowledge.start()
+
+    async def aclose(self):
+        self.knowledge.stop()
+        await close_client()
+
+    def stats(self):
+        snapshot = self.knowledge.snapshot
+        return {
+            "api_configured": self.client.configured,
+            "knowledge": self.knowledge.stats(),
+            "faq_fast_path": snapshot.faq_matcher.stats(),
+            "prompts": snapshot.prompts.stats(),
+            "response_cache": self.cache.stats(),
+            "sessions": self.sessions.stats(),
+            "single_flight": self.in_flight.stats(),
+            "upstream": self.client.stats(),
+        }
+
+
+_service = None
+
+
+def get_service() -> ChatService:
+    """Return the process-wide chat service"""
+    global _service
+    if _service is None:
+        _service = ChatService()
+    return _service
+
+
+class ChatRequest(BaseModel):
+    message: str
+    language: str = "en"
+    # Optional conversation id (or X-Session-ID header); without one each question stands alone
+    session_id: Optional[str] = None
+
+
+router = APIRouter()
+
+
+def _validate(request, x_session_id):
+    message = request.message.strip()
+    if not message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    return message, request.session_id or x_session_id
+
+
+@router.post("/chat")
+async def chat(request: ChatRequest, x_session_id: Optional[str] = Header(None)):
+    message, session_id = _validate(request, x_session_id)
+    print(f"Debug: Processing chat request: {message[:50]}...")
+    try:
+        result = await get_service().answer(message, request.language, session_id)
+    except Exception as e:
+        print(f"Unexpected error in chat endpoint: {str(e)}")
+        result = ChatAnswer("I apologize, but I encountered an error. Please try again.", "unavailable")
+    # "response" for the chat page and WordPress plugin, "message" and "status" for API clients
+    return {"response": result.text, "message": result.text, "status": ANSWER_STATUS[result.source]}
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, x_session_id: Optional[str] = Header(None)):
+    """Relay answer deltas as Server-Sent Events"""
+    message, session_id = _validate(request, x_session_id)
+    print(f"Debug: Processing streaming chat request: {message[:50]}...")
+    service = get_service()
+
+    async def event_stream():
+        try:
+            async for delta in service.stream(message, request.language, session_id):
+                yield sse_event({"delta": delta})
+        except Exception as e:
+            print(f"Chat stream failed: {str(e)}")
+            yield sse_event({"error": UNAVAILABLE_MESSAGE}, event="error")
+        yield sse_event("[DONE]")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/health")
+async def health_check():
+    return {"status": "healthy", **get_service().stats()}
+
+
+def create_app(name, title, description):
+    """FastAPI app serving the shared chat routes; entry points add their own pages"""
+    app = FastAPI(title=title, description=description, version="1.0.0")
+
+    # CORS configuration
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Latency histograms and Mistral usage counters at /metrics
+    metrics.instrument_fastapi(app, name)
+    app.include_router(router)
+
+    @app.on_event("startup")
+    async def start_service():
+        get_service().start()
+
+    @app.on_event("shutdown")
+    async def stop_service():
+        await get_service().aclose()
+
+    return app
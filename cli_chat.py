@@ -1,6 +1,7 @@
-import requests
 import os
 from dotenv import load_dotenv
+import metrics
+from mistral_client import get_client, run_sync
 
 def main():
     # Load environment variables
@@ -14,12 +15,8 @@ def main():
         
     print(f"Initializing with API key (starts with: {api_key[:4]}...)")
     
-    # API endpoint
-    endpoint = "https://api.mistral.ai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    # Shared pooled client; retries and metrics are handled there
+    client = get_client()
     
     # Store conversation history
     messages = []
@@ -38,21 +35,13 @@ def main():
         messages.append({"role": "user", "content": user_input})
         
         try:
-            # Prepare request data
-            data = {
-                "model": "mistral-small-latest",
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1024
-            }
-            
             # Make API request
-            response = requests.post(endpoint, headers=headers, json=data)
-            response.raise_for_status()  # Raise an exception for bad status codes
+            with metrics.endpoint("cli_chat"):
+                assistant_response = run_sync(client.chat(
+                    messages, model="mistral-small-latest", temperature=0.7, max_tokens=1024
+                ))
             
-            # Get and print assistant's response
-            result = response.json()
-            assistant_response = result["choices"][0]["message"]["content"]
+            # Print assistant's response
             print("\nAssistant:", assistant_response)
             
             # Add assistant response to history
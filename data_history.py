@@ -0,0 +1,177 @@
+import contextlib
+import glob
+import gzip
+import hashlib
+import os
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from file_utils import atomic_write_text
+
+TRAINING_DATA_HISTORY_DIR = os.getenv("TRAINING_DATA_HISTORY_DIR", "training_data_history")
+# Versions kept; older ones are deleted after each save
+TRAINING_DATA_HISTORY_KEEP = int(os.getenv("TRAINING_DATA_HISTORY_KEEP", "20"))
+
+# <milliseconds>-<content hash>.json.gz, so names sort by save time
+VERSION_FILE = re.compile(r"^(\d+)-([0-9a-f]{12})\.json\.gz$")
+
+
+def content_version(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+class DataHistory:
+    """Gzip-compressed versions of a JSON file with bounded retention.
+
+    commit() records the file's current content if it is not already the
+    latest version (e.g. a hand edit), atomically replaces the file, and
+    records the new content. Versions are named by content hash, so rolling
+    back is a commit of an older version's text.
+    """
+
+    def __init__(self, path, directory=TRAINING_DATA_HISTORY_DIR, keep=TRAINING_DATA_HISTORY_KEEP):
+        self.path = path
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _entries(self):
+        """(filename, saved_at_ms, version) for every stored version, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            match = VERSION_FILE.match(name)
+            if match:
+                entries.append((name, int(match.group(1)), match.group(2)))
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def _record(self, text, saved_at=None):
+        version = content_version(text)
+        entries = self._entries()
+        if entries and entries[-1][2] == version:
+            return version
+        saved_at_ms = int((saved_at if saved_at is not None else time.time()) * 1000)
+        # Never sort before the latest version, even if the clock went backwards
+        if entries:
+            saved_at_ms = max(saved_at_ms, entries[-1][1] + 1)
+        os.makedirs(self.directory, exist_ok=True)
+        target = os.path.join(self.directory, f"{saved_at_ms}-{version}.json.gz")
+        tmp_path = target + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, target)
+        return version
+
+    def _prune(self):
+        entries = self._entries()
+        for name, _, _ in entries[:max(0, len(entries) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass  # Pruned by another worker
+
+    def current_text(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def commit(self, text):
+        """Atomically replace the file with text, keeping the previous content in history.
+
+        Returns the new version.
+        """
+        with self._lock:
+            current = self.current_text()
+            if current is not None:
+                self._record(current)
+            atomic_write_text(self.path, text)
+            version = self._record(text)
+            self._prune()
+            return version
+
+    def versions(self):
+        """Stored versions, newest first"""
+        current = self.current_text()
+        current_version = content_version(current) if current is not None else None
+        versions = []
+        for name, saved_at_ms, version in reversed(self._entries()):
+            versions.append({
+                "version": version,
+                "saved_at": saved_at_ms / 1000,
+                "compressed_bytes": os.path.getsize(os.path.join(self.directory, name)),
+                "current": version == current_version,
+            })
+        return versions
+
+    def load(self, version):
+        """Text of a stored version; raises KeyError if it is unknown or was pruned"""
+        for name, _, stored in reversed(self._entries()):
+            if stored == version:
+                with gzip.open(os.path.join(self.directory, name), "rt", encoding="utf-8") as f:
+                    return f.read()
+        raise KeyError(version)
+
+    def rollback(self, version):
+        """Make a stored version current again; returns its version"""
+        return self.commit(self.load(version))
+
+    @contextlib.contextmanager
+    def _process_lock(self):
+        """Exclusive lock shared by every process using this history directory"""
+        with self._lock:
+            if fcntl is None:
+                # No flock on Windows; the per-file checks below still keep concurrent imports safe
+                yield
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def import_backups(self, pattern):
+        """Move old full-copy backup files (e.g. training_data_backup_<time>.json) into history.
+
+        Runs under a cross-process lock, so concurrent callers (e.g. gunicorn
+        workers) import each file once; files another process already moved
+        are skipped.
+        """
+        imported = 0
+        with self._process_lock():
+            backups = []
+            for path in glob.glob(pattern):
+                try:
+                    backups.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    continue
+            for saved_at, path in sorted(backups):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                except FileNotFoundError:
+                    continue
+                self._record(text, saved_at=saved_at)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                imported += 1
+            if imported:
+                self._prune()
+        return imported
+
+
+if __name__ == "__main__":
+    imported = DataHistory("training_data.json").import_backups("training_data_backup_*.json")
+    print(f"Moved {imported} old training data backups into {TRAINING_DATA_HISTORY_DIR}")
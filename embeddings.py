@@ -0,0 +1,113 @@
+import os
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+
+# Items encoded between appends, so an interrupted run keeps what it finished
+APPEND_EVERY = EMBEDDING_BATCH_SIZE * 16
+
+
+class EmbeddingService:
+    """Sentence-transformers encoder, loaded on first use, that embeds text in large batches"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, batch_size=EMBEDDING_BATCH_SIZE, device=EMBEDDING_DEVICE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    @property
+    def dim(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        """Unit-length float32 embeddings, one row per text"""
+        return self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+
+    def encode_query(self, text):
+        return self.encode([text])[0]
+
+    def embed_into(self, store, items):
+        """Encode (id, text, metadata) items missing from store and append them.
+
+        items may be a lazy iterable; it is encoded APPEND_EVERY new items at a
+        time as it is read. Returns the number of vectors added.
+        """
+        added = skipped = encoded = 0
+        batch, seen = [], set()
+        start = time.perf_counter()
+
+        def flush():
+            nonlocal added, encoded
+            vectors = self.encode(text for _, text, _ in batch)
+            added += store.append([item_id for item_id, _, _ in batch], vectors, [meta for _, _, meta in batch])
+            encoded += len(batch)
+            print(f"Encoded {encoded} items ({encoded / (time.perf_counter() - start):.1f} items/sec)")
+            batch.clear()
+
+        for item_id, text, metadata in items:
+            if item_id in store or item_id in seen or not text.strip():
+                skipped += 1
+                continue
+            seen.add(item_id)
+            batch.append((item_id, text, dict(metadata, text=text)))
+            if len(batch) >= APPEND_EVERY:
+                flush()
+        if batch:
+            flush()
+        print(f"Embeddings: {skipped} cached or empty, {encoded} encoded")
+        return added
+
+
+def chunk_items(chunks, source):
+    """(id, text, metadata) items for PDF chunks, keyed by chunk content hash"""
+    from ingest_cache import chunk_key
+
+    for chunk in chunks:
+        yield f"chunk:{chunk_key(chunk)}", chunk, {"kind": "chunk", "source": source}
+
+
+def qa_items(qa_pairs, source):
+    """(id, text, metadata) items for Q&A pairs, keyed by question and answer hash"""
+    from ingest_cache import chunk_key
+
+    items = []
+    for pair in qa_pairs:
+        text = f"Q: {pair['question']}\nA: {pair['answer']}"
+        items.append((f"qa:{chunk_key(text)}", text, {"kind": "qa", "source": source}))
+    return items
+
+
+if __name__ == "__main__":
+    # Backfill the store with every Q&A pair in training_examples.jsonl
+    from retrieval import TRAINING_EXAMPLES_FILE, passages_from_examples
+    from vector_store import VectorStore
+
+    service = EmbeddingService()
+    store = VectorStore(model=service.model_name)
+    pairs = []
+    for passage in passages_from_examples(TRAINING_EXAMPLES_FILE):
+        question, _, answer = passage.text[len("Q: "):].partition("\nA: ")
+        pairs.append({"question": question, "answer": answer})
+    added = service.embed_into(store, qa_items(pairs, "training_examples"))
+    print(f"Added {added} vectors; {len(store)} in {store.path}")
@@ -0,0 +1,132 @@
+import math
+import os
+import sys
+import time
+from collections import namedtuple
+from typing import Dict, Optional
+
+from text_utils import normalize_text, char_ngrams
+
+# Cosine similarity over character trigrams needed to answer without the LLM
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.8"))
+# Looser threshold used only when Mistral is unavailable: a close FAQ beats an apology
+FAQ_FALLBACK_THRESHOLD = float(os.getenv("FAQ_FALLBACK_THRESHOLD", "0.5"))
+
+FaqEntry = namedtuple("FaqEntry", ["key", "question", "answers"])
+FaqMatch = namedtuple("FaqMatch", ["key", "answer", "score"])
+
+
+class FaqMatcher:
+    """Answers near-duplicates of the canned FAQ entries without calling Mistral"""
+
+    def __init__(self, training_data: Dict, threshold: float = FAQ_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.entries = []
+        self.exact = {}
+        self.vectors = []
+        self.norms = []
+        self.ngram_index = {}
+        self.lookups = 0
+        self.hits = 0
+
+        for key, faq in training_data.get("faqs", {}).items():
+            answers = faq.get("answer", {})
+            for question in faq.get("question", {}).values():
+                self._add(FaqEntry(f"faqs.{key}", question, answers))
+
+        # Common responses have no question text, so their topic name is the question
+        for key, answers in training_data.get("common_responses", {}).items():
+            self._add(FaqEntry(f"common_responses.{key}", key.replace("_", " "), answers))
+
+    def _add(self, entry):
+        normalized = normalize_text(entry.question)
+        if not normalized:
+            return
+        entry_id = len(self.entries)
+        self.entries.append(entry)
+        self.exact.setdefault(normalized, entry_id)
+        vector = char_ngrams(normalized)
+        self.vectors.append(vector)
+        self.norms.append(math.sqrt(sum(c * c for c in vector.values())))
+        for gram in vector:
+            self.ngram_index.setdefault(gram, []).append(entry_id)
+
+    def _answer(self, entry_id, language, score):
+        entry = self.entries[entry_id]
+        answer = entry.answers.get(language) or entry.answers.get("en")
+        if not answer:
+            return None
+        return FaqMatch(entry.key, answer, score)
+
+    def match(self, question: str, language: str = "en") -> Optional[FaqMatch]:
+        """Return the canned answer for a question above the threshold, else None"""
+        self.lookups += 1
+        normalized = normalize_text(question)
+        if not normalized:
+            return None
+
+        entry_id = self.exact.get(normalized)
+        if entry_id is not None:
+            result = self._answer(entry_id, language, 1.0)
+        else:
+            result = self._best_similar(normalized, language, self.threshold)
+
+        if result is not None:
+            self.hits += 1
+        return result
+
+    def fallback(self, question: str, language: str = "en",
+                 threshold: float = FAQ_FALLBACK_THRESHOLD) -> Optional[FaqMatch]:
+        """Closest canned answer above the looser fallback threshold; not counted in stats"""
+        normalized = normalize_text(question)
+        if not normalized:
+            return None
+        entry_id = self.exact.get(normalized)
+        if entry_id is not None:
+            return self._answer(entry_id, language, 1.0)
+        return self._best_similar(normalized, language, threshold)
+
+    def _best_similar(self, normalized, language, threshold):
+        query = char_ngrams(normalized)
+        query_norm = math.sqrt(sum(c * c for c in query.values()))
+        dots = {}
+        for gram, count in query.items():
+            for entry_id in self.ngram_index.get(gram, ()):
+                dots[entry_id] = dots.get(entry_id, 0) + count * self.vectors[entry_id][gram]
+        if not dots:
+            return None
+
+        entry_id, dot = max(dots.items(), key=lambda item: item[1] / self.norms[item[0]])
+        score = dot / (query_norm * self.norms[entry_id])
+        if score < threshold:
+            return None
+        return self._answer(entry_id, language, score)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self.entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+def load_faq_matcher(path="training_data.json") -> FaqMatcher:
+    """Matcher over a training data file; empty if the file is missing or invalid"""
+    import json
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return FaqMatcher(json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"Error loading FAQs from {path}: {str(e)}")
+        return FaqMatcher({})
+
+
+if __name__ == "__main__":
+    matcher = load_faq_matcher()
+
+    question = " ".join(sys.argv[1:]) or "how can i track my order"
+    start = time.perf_counter()
+    result = matcher.match(question)
+    print(f"Matched in {(time.perf_counter() - start) * 1000:.3f} ms: {result}")
@@ -1,5 +1,24 @@
-bind = "0.0.0.0:8000"
-workers = 4
+import os
+
+# One worker model for every deployment: gunicorn managing uvicorn workers that
+# each run the shared async chat core (chat_service.py). Each worker holds up to
+# MISTRAL_MAX_CONCURRENCY upstream calls, so capacity is roughly
+# workers * MISTRAL_MAX_CONCURRENCY concurrent chats.
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
 worker_class = "uvicorn.workers.UvicornWorker"
-timeout = 120
-keepalive = 5
+# Mistral calls give up after MISTRAL_DEADLINE, well before this
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+
+def on_starting(server):
+    # Workers aggregate /metrics through METRICS_DIR; drop snapshots from the last run
+    import metrics
+    metrics.clear_metrics_dir()
+
+    # Move legacy full-copy backups into the history once, before any worker imports main
+    from data_history import DataHistory
+    imported = DataHistory("training_data.json").import_backups("training_data_backup_*.json")
+    if imported:
+        print(f"Moved {imported} old training data backups into the training data history")
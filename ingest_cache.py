@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from file_utils import atomic_write_text
+from pdf_extract import iter_pages
+from qa_pipeline import generate_concurrently, generate_in_batches
+
+INGEST_MANIFEST = os.getenv("INGEST_MANIFEST", "training_data/ingest_manifest.json")
+TRAINING_EXAMPLES_FILE = "training_data/training_examples.jsonl"
+
+
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_key(chunk):
+    return hashlib.sha256(chunk.strip().encode("utf-8")).hexdigest()
+
+
+def page_hashes(pdf_path):
+    """Hash each page's content stream plus the raw data of the images it draws.
+
+    Scanned pages share near-identical content streams, so the image bytes are
+    what tells them apart.
+    """
+    import PyPDF2
+
+    hashes = []
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file, strict=False)
+        for page in reader.pages:
+            digest = hashlib.sha256()
+            contents = page.get_contents()
+            digest.update(contents.get_data() if contents is not None else b"")
+            resources = page.get("/Resources")
+            resources = resources.get_object() if resources is not None else {}
+            xobjects = resources.get("/XObject")
+            xobjects = xobjects.get_object() if xobjects is not None else {}
+            for name in sorted(xobjects):
+                digest.update(name.encode("utf-8"))
+                digest.update(getattr(xobjects[name].get_object(), "_data", b"") or b"")
+            hashes.append(digest.hexdigest())
+    return hashes
+
+
+class IngestManifest:
+    """On-disk record of extracted pages and generated Q&A pairs, keyed by content hash.
+
+    Page text lives in one append-only file per document under pages_dir
+    (default: ingest_pages next to the manifest); the manifest only maps each
+    page hash to its (file, offset, length), so saving it stays cheap.
+
+    One manifest can be shared by jobs running in several threads; writes and
+    save() hold lock, so a save never serializes a dict that is being changed
+    and saves reach the disk in the order they were taken.
+    """
+
+    def __init__(self, path=INGEST_MANIFEST, pages_dir=None):
+        self.path = path
+        self.pages_dir = pages_dir or os.path.join(os.path.dirname(path), "ingest_pages")
+        self.lock = threading.RLock()
+        self.data = {"files": {}, "pages": {}, "chunks": {}}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data.update(json.load(f))
+        self._migrate_pages()
+
+    def _migrate_pages(self):
+        # Older manifests kept the page text itself; move it out once
+        legacy = {h: text for h, text in self.data["pages"].items() if isinstance(text, str)}
+        if not legacy:
+            return
+        with self._page_writer("legacy") as write:
+            for h, text in legacy.items():
+                self.data["pages"][h] = write(text)
+        self.save()
+        print(f"Moved {len(legacy)} cached pages out of {self.path}")
+
+    def _page_path(self, name):
+        return os.path.join(self.pages_dir, f"{name}.txt")
+
+    @contextmanager
+    def _page_writer(self, name):
+        """write(text) appends a page to pages_dir/name.txt and returns its [name, offset, length]"""
+        files = []
+
+        def write(text):
+            data = text.encode("utf-8")
+            with self.lock:
+                if not files:
+                    os.makedirs(self.pages_dir, exist_ok=True)
+                    # Unbuffered, so a page is in the file before the manifest can refer to it
+                    files.append(open(self._page_path(name), 'ab', buffering=0))
+                offset = files[0].seek(0, os.SEEK_END)
+                files[0].write(data)
+            return [name, offset, len(data)]
+
+        try:
+            yield write
+        finally:
+            for f in files:
+                f.close()
+
+    @contextmanager
+    def _page_reader(self):
+        """read(ref) returns the page text, or None if its file is missing or too short"""
+        files = {}
+
+        def read(ref):
+            name, offset, length = ref
+            try:
+                if name not in files:
+                    files[name] = open(self._page_path(name), 'rb')
+                f = files[name]
+                f.seek(offset)
+                data = f.read(length)
+            except OSError:
+                return None
+            return data.decode("utf-8") if len(data) == length else None
+
+        try:
+            yield read
+        finally:
+            for f in files.values():
+                f.close()
+
+    def save(self):
+        # Write under the lock too, so an older snapshot can never replace a newer one
+        with self.lock:
+            atomic_write_text(self.path, json.dumps(self.data, ensure_ascii=False, sort_keys=True))
+
+    def iter_text(self, pdf_path, **extract_options):
+        """Yield the document's page texts in order, extracting only pages whose content hash is not cached yet.
+
+        Uncached pages are extracted as the iterator advances, so callers can
+        start on the first pages while later ones are still being extracted.
+        Cached pages are read from disk one at a time.
+        """
+        file_hash = sha256_file(pdf_path)
+        record = self.data["files"].get(pdf_path, {})
+        if record.get("sha256") == file_hash and "page_hashes" in record:
+            hashes = record["page_hashes"]
+        else:
+            hashes = page_hashes(pdf_path)
+        with self.lock:
+            self.data["files"][pdf_path] = dict(record, sha256=file_hash, page_hashes=hashes)
+
+        pages = self.data["pages"]
+        stored = {ref[0] for ref in (pages.get(h) for h in hashes) if ref}
+        lost = {name for name in stored if not os.path.exists(self._page_path(name))}
+        missing = [i for i, h in enumerate(hashes) if h not in pages or pages[h][0] in lost]
+        print(f"Pages: {len(hashes) - len(missing)} cached, {len(missing)} to extract")
+        stats = Counter()
+        extracted = iter_pages(pdf_path, page_indices=missing, stats=stats, **extract_options) if missing else None
+        missing = set(missing)
+        with self._page_reader() as read, self._page_writer(file_hash) as write:
+            for page_index, h in enumerate(hashes):
+                text = None if page_index in missing else read(pages[h])
+                if text is None:
+                    if page_index in missing:
+                        _, text = next(extracted)
+                    else:
+                        # Its page file was cut short; extract this page again
+                        _, text = next(iter_pages(pdf_path, page_indices=[page_index], **extract_options))
+                    ref = write(text)
+                    with self.lock:
+                        pages[h] = ref
+                yield text
+        if missing:
+            print(f"Extracted {len(missing)} pages ({', '.join(f'{k}: {v}' for k, v in sorted(stats.items()))})")
+
+    def extract_text(self, pdf_path, **extract_options):
+        """Whole document text; prefer iter_text for large documents"""
+        return "\n".join(page for page in self.iter_text(pdf_path, **extract_options) if page)
+
+    def generate(self, chunks, generate, pdf_path=None, generate_batch=None, on_generated=None, on_result=None,
+                 **generate_options):
+        """Q&A pairs per chunk, in chunk order, calling generate only for chunks not seen before.
+
+        chunks may be a lazy iterable; it is consumed as generation proceeds.
+        With generate_batch, new chunks are sent several per request (see
+        generate_in_batches). on_generated(key, qa_pairs) is called on the
+        calling thread as each new chunk finishes. If pdf_path is given, the
+        document's chunk list is recorded as well.
+        """
+        cached = self.data["chunks"]
+        keys, todo = [], []
+
+        def new_chunks():
+            # Identical chunks in one document are generated once
+            queued = set()
+            for chunk in chunks:
+                key = chunk_key(chunk)
+                keys.append(key)
+                if key not in cached and key not in queued:
+                    queued.add(key)
+                    todo.append(key)
+                    yield chunk
+
+        def finished(i, qa_pairs):
+            # Failed chunks return nothing and are retried on the next run
+            if qa_pairs:
+                with self.lock:
+                    cached[todo[i]] = qa_pairs
+            if on_generated:
+                on_generated(todo[i], qa_pairs)
+            if on_result:
+                on_result(i, qa_pairs)
+
+        if generate_batch is not None:
+            generate_in_batches(new_chunks(), generate_batch, generate, on_result=finished, **generate_options)
+        else:
+            generate_concurrently(new_chunks(), generate, on_result=finished, **generate_options)
+        print(f"Chunks: {len(keys) - len(todo)} cached, {len(todo)} generated")
+
+        if pdf_path is not None:
+            self.record_chunks(pdf_path, keys)
+        return [cached.get(key, []) for key in keys]
+
+    def record_chunks(self, pdf_path, keys):
+        with self.lock:
+            self.data["files"].setdefault(pdf_path, {})["chunks"] = list(keys)
+
+
+def example_key(example):
+    return json.dumps(example, sort_keys=True, ensure_ascii=False)
+
+
+def training_example(qa_pair):
+    return {
+        "messages": [
+            {"role": "user", "content": qa_pair['question']},
+            {"role": "assistant", "content": qa_pair['answer']}
+        ]
+    }
+
+
+def merge_training_examples(examples, output_file=TRAINING_EXAMPLES_FILE):
+    """Add examples to a JSONL file, keeping existing order and dropping exact duplicates"""
+    merged, seen = [], set()
+    if os.path.exists(output_file):
+        with open(output_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    merged.append(json.loads(line))
+
+    result, added = [], 0
+    for position, example in enumerate(merged + list(examples)):
+        key = example_key(example)
+        if key not in seen:
+            seen.add(key)
+            result.append(example)
+            added += position >= len(merged)
+
+    atomic_write_text(output_file, "".join(json.dumps(example) + '\n' for example in result))
+    return added
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from ingest_cache import TRAINING_EXAMPLES_FILE, IngestManifest, merge_training_examples, training_example
+from text_splitter import split_pages
+
+# Append-only checkpoint logs of jobs that have not been compacted yet
+INGEST_JOB_DIR = os.getenv("INGEST_JOB_DIR", "training_data/jobs")
+# fsync after every committed chunk; 0 trades crash safety for fewer disk flushes
+INGEST_JOB_FSYNC = os.getenv("INGEST_JOB_FSYNC", "1") == "1"
+
+# Compaction rewrites the shared training file, so jobs in one process take turns
+_compact_lock = threading.Lock()
+
+
+class IngestJob:
+    """Checkpointed Q&A generation for one PDF.
+
+    Every chunk's pairs are appended to a log as soon as they arrive, so an
+    interrupted run (crash, Ctrl-C, deploy) loses at most the chunks that were
+    in flight. Running the job again replays the log into the manifest cache
+    and only generates the chunks that were never committed. compact() turns
+    the log into training examples, merges them into the training file and
+    removes the log.
+
+    Chunks are still generated concurrently; commits happen on the calling
+    thread, so the log has a single writer. Jobs for different PDFs use
+    different logs and can run side by side.
+    """
+
+    def __init__(self, pdf_path, manifest=None, job_dir=INGEST_JOB_DIR):
+        self.pdf_path = pdf_path
+        self.manifest = manifest if manifest is not None else IngestManifest()
+        name = re.sub(r"[^\w.-]+", "_", os.path.splitext(os.path.basename(pdf_path))[0])
+        path_hash = hashlib.sha256(os.path.abspath(pdf_path).encode("utf-8")).hexdigest()[:12]
+        self.log_path = os.path.join(job_dir, f"{name}-{path_hash}.log.jsonl")
+
+    def committed(self):
+        """Chunk key -> Q&A pairs committed to the log, in commit order"""
+        records = {}
+        if not os.path.exists(self.log_path):
+            return records
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line of a killed run can be cut short
+                    continue
+                records[record["key"]] = record["pairs"]
+        return records
+
+    def _open_log(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        torn = False
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path):
+            with open(self.log_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        log = open(self.log_path, 'a', encoding='utf-8')
+        if torn:
+            # Start on a fresh line if the previous run died mid-record
+            log.write("\n")
+        return log
+
+    def run(self, generate, generate_batch=None, chunks=None, **generate_options):
+        """Generate Q&A pairs for the PDF's uncommitted chunks; returns pairs per chunk in order.
+
+        chunks defaults to splitting the pages from the manifest as they are extracted.
+        """
+        committed = self.committed()
+        if committed:
+            print(f"Resuming from {self.log_path}: {len(committed)} chunks already committed")
+            with self.manifest.lock:
+                self.manifest.data["chunks"].update(committed)
+
+        with self._open_log() as log:
+            def commit(key, qa_pairs):
+                if not qa_pairs:
+                    return
+                log.write(json.dumps({"key": key, "pairs": qa_pairs}, ensure_ascii=False) + "\n")
+                log.flush()
+                if INGEST_JOB_FSYNC:
+                    os.fsync(log.fileno())
+
+            if chunks is None:
+                chunks = split_pages(self.manifest.iter_text(self.pdf_path))
+            results = self.manifest.generate(
+                chunks, generate, pdf_path=self.pdf_path, generate_batch=generate_batch, on_generated=commit,
+                **generate_options
+            )
+        self.manifest.save()
+        return results
+
+    def compact(self, output_file=TRAINING_EXAMPLES_FILE):
+        """Merge the document's examples, in chunk order, into output_file and drop the log.
+
+        Chunks missing from the log (generated by an earlier, already compacted
+        run) are taken from the manifest cache. Returns (examples, added).
+        """
+        committed = self.committed()
+        cached = self.manifest.data["chunks"]
+        keys = self.manifest.data["files"].get(self.pdf_path, {}).get("chunks", list(committed))
+        examples = [
+            training_example(pair)
+            for key in keys
+            for pair in committed.get(key) or cached.get(key) or []
+        ]
+        with _compact_lock:
+            added = merge_training_examples(examples, output_file)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        return len(examples), added
+
+
+def pending_jobs(job_dir=INGEST_JOB_DIR):
+    """Logs of jobs that were interrupted or not compacted yet"""
+    if not os.path.isdir(job_dir):
+        return []
+    return sorted(os.path.join(job_dir, name) for name in os.listdir(job_dir) if name.endswith(".log.jsonl"))
+
+
+if __name__ == "__main__":
+    for path in pending_jobs():
+        with open(path, 'r', encoding='utf-8') as f:
+            print(f"{path}: {sum(1 for _ in f)} chunks committed")
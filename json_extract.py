@@ -0,0 +1,97 @@
+import json
+import re
+
+# Characters that can change the scanner's state; everything else is skipped in bulk
+STRUCTURAL = re.compile(r'[{}"\\]')
+# Trailing commas before a closing bracket, a common slip in model output
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class JSONObjectExtractor:
+    """Pull JSON objects out of free-form model output in one pass.
+
+    Text can be fed in pieces (a whole response, or streamed deltas). Any "{"
+    outside an object starts a candidate, which ends when its braces balance;
+    braces inside strings are ignored. Prose, markdown fences and array
+    brackets around the objects are skipped, so objects in ``` blocks, in JSON
+    arrays or spread over several lines are all recovered.
+
+    A candidate that does not parse, even with trailing commas removed, counts
+    as malformed, and the well-formed objects nested inside it are kept.
+    """
+
+    def __init__(self):
+        self.malformed = 0
+        self._pieces = []
+        self._depth = 0
+        self._in_string = False
+        self._skip = None
+
+    def feed(self, text):
+        """Yield the objects completed by text"""
+        start = 0 if self._depth else None
+        for match in STRUCTURAL.finditer(text):
+            i = match.start()
+            if i == self._skip:
+                # Escaped character inside a string
+                self._skip = None
+                continue
+            char = match.group()
+            if not self._depth:
+                if char == "{":
+                    self._depth, start = 1, i
+                continue
+            if char == "\\":
+                if self._in_string:
+                    self._skip = i + 1
+            elif char == '"':
+                self._in_string = not self._in_string
+            elif self._in_string:
+                continue
+            elif char == "{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if not self._depth:
+                    self._pieces.append(text[start:i + 1])
+                    candidate = "".join(self._pieces)
+                    self._pieces, start = [], None
+                    yield from self._parse(candidate)
+
+        if self._depth:
+            self._pieces.append(text[start:])
+        # An escape at the very end applies to the first character of the next piece
+        self._skip = 0 if self._skip == len(text) else None
+
+    def close(self):
+        """Objects recoverable from an unfinished candidate (e.g. output cut off by max_tokens)"""
+        candidate = "".join(self._pieces)
+        self._pieces, self._depth, self._in_string, self._skip = [], 0, False, None
+        if not candidate:
+            return []
+        self.malformed += 1
+        return self._nested(candidate)
+
+    def extract(self, text):
+        """Every object in a complete text"""
+        return list(self.feed(text)) + self.close()
+
+    def _parse(self, candidate):
+        for attempt in (candidate, TRAILING_COMMA.sub(r"\1", candidate)):
+            try:
+                return [json.loads(attempt, strict=False)]
+            except ValueError:
+                continue
+        self.malformed += 1
+        return self._nested(candidate)
+
+    @staticmethod
+    def _nested(candidate):
+        # Skip the outer "{" so the objects inside it become candidates themselves
+        inner = JSONObjectExtractor()
+        return inner.extract(candidate[1:])
+
+
+def extract_objects(text):
+    """JSON objects found anywhere in text (see JSONObjectExtractor)"""
+    return JSONObjectExtractor().extract(text or "")
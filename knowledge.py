@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+from faq_matcher import FaqMatcher
+from prompts import PromptBuilder
+from retrieval import DENSE_RETRIEVAL, TRAINING_DATA_FILE, TRAINING_EXAMPLES_FILE, VECTOR_IDS_FILE
+from retrieval import build_index, load_dense_index
+
+# Seconds between checks of the source files for changes made by any process
+KNOWLEDGE_POLL_INTERVAL = float(os.getenv("KNOWLEDGE_POLL_INTERVAL", "2"))
+
+KnowledgeSnapshot = namedtuple(
+    "KnowledgeSnapshot",
+    ["version", "fingerprint", "training_data", "index", "faq_matcher", "prompts", "dense_index", "loaded_at"],
+)
+
+
+def file_fingerprint(paths):
+    """(path, inode, mtime, size) per file; an atomic rename changes the inode even within one mtime tick"""
+    fingerprint = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            fingerprint.append((path, st.st_ino, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            fingerprint.append((path, None, None, None))
+    return tuple(fingerprint)
+
+
+class KnowledgeBase:
+    """Immutable snapshot of the training data and everything derived from it.
+
+    Requests read .snapshot once and use that object throughout, so a reload
+    never changes data under an in-flight chat. A background thread watches
+    the source files' fingerprints; when any process (e.g. another gunicorn
+    worker handling /admin/data) changes them, a new snapshot is built off the
+    request path and swapped in with a single reference assignment.
+
+    load_training_data(strict) returns the training data dict; with strict=True
+    it must raise instead of falling back to defaults.
+    """
+
+    def __init__(self, load_training_data, examples_path=TRAINING_EXAMPLES_FILE, dense=DENSE_RETRIEVAL,
+                 poll_interval=KNOWLEDGE_POLL_INTERVAL, on_reload=None):
+        self.load_training_data = load_training_data
+        self.examples_path = examples_path
+        self.dense = dense
+        self.paths = [TRAINING_DATA_FILE, examples_path] + ([VECTOR_IDS_FILE] if dense else [])
+        self.poll_interval = poll_interval
+        self.on_reload = list(on_reload or [])
+        self.reloads = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.snapshot = self._build(None)
+
+    def _build(self, previous):
+        # Fingerprint before reading, so a write during the build triggers another reload
+        fingerprint = file_fingerprint(self.paths)
+        # Reloads must not swap in fallback data because of a bad file; the old snapshot stays
+        training_data = self.load_training_data(strict=previous is not None)
+        previous_dense = previous.dense_index if previous is not None else None
+        return KnowledgeSnapshot(
+            # Derived from the files, so every worker that loaded the same files reports the same version
+            version=hashlib.sha256(repr(fingerprint).encode("utf-8")).hexdigest()[:12],
+            fingerprint=fingerprint,
+            training_data=training_data,
+            index=build_index(training_data, self.examples_path),
+            faq_matcher=FaqMatcher(training_data),
+            prompts=PromptBuilder(training_data),
+            dense_index=load_dense_index(
+                self.dense, embedder=previous_dense.embedder if previous_dense is not None else None
+            ),
+            loaded_at=time.time(),
+        )
+
+    def reload(self, force=False):
+        """Rebuild the snapshot if the source files changed; returns True if it was swapped"""
+        with self._lock:
+            current = self.snapshot
+            if not force and file_fingerprint(self.paths) == current.fingerprint:
+                return False
+            start = time.perf_counter()
+            snapshot = self._build(current)
+            self.snapshot = snapshot
+            self.reloads += 1
+        print(f"Debug: Loaded knowledge version {snapshot.version} ({len(snapshot.index)} passages) "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for callback in self.on_reload:
+            callback(snapshot)
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+                self.last_error = None
+            except Exception as e:
+                # Keep serving the last good snapshot; report each new error once
+                if str(e) != self.last_error:
+                    print(f"Error reloading knowledge: {str(e)}")
+                self.last_error = str(e)
+
+    def start(self):
+        """Start watching the source files in a daemon thread"""
+        if self._thread is None and self.poll_interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="knowledge-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            "version": snapshot.version,
+            "passages": len(snapshot.index),
+            "vectors": len(snapshot.dense_index) if snapshot.dense_index is not None else 0,
+            "loaded_at": snapshot.loaded_at,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
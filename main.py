@@ -1,98 +1,56 @@
-from fastapi import FastAPI, HTTPException, Request, Depends
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import APIRouter, HTTPException, Request, Depends
 from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
 import os
 import json
-import time
-import requests
-from dotenv import load_dotenv
+import secrets
+from fastapi.concurrency import run_in_threadpool
+from chat_service import create_app, get_service
+from data_history import DataHistory
 
 print("Starting application...")
 
-# Load environment variables
-load_dotenv()
 MISTRAL_API_KEY = os.getenv('MISTRAL_API_KEY')
-API_ENDPOINT = "https://api.mistral.ai/v1/chat/completions"
 
-# Initialize FastAPI
-app = FastAPI(
+# Chat, health and metrics routes come from the shared serving core
+app = create_app(
+    "main",
     title="Souqcoom Support Chat",
     description="AI-powered customer support chat for Souq.com",
-    version="1.0.0"
 )
 
 # Mount static files and templates
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# CORS configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # Print API key status
 print(f"Debug: API Key present: {bool(MISTRAL_API_KEY)}")
 print(f"Debug: API Key length: {len(MISTRAL_API_KEY) if MISTRAL_API_KEY else 0}")
 
-# Default training data
-DEFAULT_TRAINING_DATA = {
-    "company_info": {
-        "name": "Souq.com",
-        "description": "Souq.com is the largest e-commerce platform in the Arab world.",
-        "values": ["Customer satisfaction", "Fast delivery", "Authentic products"]
-    },
-    "common_responses": {
-        "shipping": {
-            "en": "Shipping takes 2-5 business days.",
-            "ar": "يستغرق الشحن من 2 إلى 5 أيام عمل."
-        }
-    },
-    "product_categories": ["Electronics", "Fashion", "Home"],
-    "faqs": {},
-    "support_workflow": {
-        "greeting": {
-            "en": "Welcome to Souq.com support!",
-            "ar": "مرحباً بكم في دعم سوق.كوم!"
-        }
-    }
-}
-
-# Load training data
-def load_training_data():
-    try:
-        with open("training_data.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Create default training data file
-        with open("training_data.json", "w", encoding="utf-8") as f:
-            json.dump(DEFAULT_TRAINING_DATA, f, indent=4, ensure_ascii=False)
-        return DEFAULT_TRAINING_DATA
-    except Exception as e:
-        return DEFAULT_TRAINING_DATA
+# Compressed, bounded history of training_data.json for rollback from the admin API
+data_history = DataHistory("training_data.json")
+# Under gunicorn the master has already done this (on_starting); the history's
+# file lock keeps concurrent workers or direct uvicorn runs from racing on it
+imported_backups = data_history.import_backups("training_data_backup_*.json")
+if imported_backups:
+    print(f"Debug: Moved {imported_backups} old training data backups into {data_history.directory}")
 
-# Load initial training data
-training_data = load_training_data()
+# Shared pool, cache, sessions and knowledge snapshot for this process
+service = get_service()
 
-class ChatRequest(BaseModel):
-    message: str
-    language: str = "en"
-
-# Admin credentials
-ADMIN_USERNAME = "admin"
-ADMIN_PASSWORD = "souqcoom2024"
+# Admin credentials; the admin routes are only mounted when both are set
+ADMIN_USERNAME = os.getenv('ADMIN_USERNAME')
+ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD')
 
 security = HTTPBasic()
+admin = APIRouter()
 
 def verify_admin(credentials: HTTPBasicCredentials):
-    if credentials.username != ADMIN_USERNAME or credentials.password != ADMIN_PASSWORD:
+    username_ok = secrets.compare_digest(credentials.username.encode("utf-8"), ADMIN_USERNAME.encode("utf-8"))
+    password_ok = secrets.compare_digest(credentials.password.encode("utf-8"), ADMIN_PASSWORD.encode("utf-8"))
+    if not (username_ok and password_ok):
         raise HTTPException(
             status_code=401,
             detail="Invalid credentials",
@@ -106,20 +64,20 @@ async def root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 # Serve admin page
-@app.get("/admin", response_class=HTMLResponse)
+@admin.get("/admin", response_class=HTMLResponse)
 async def admin_page(credentials: HTTPBasicCredentials = Depends(security)):
     verify_admin(credentials)
     with open("templates/admin.html", "r", encoding="utf-8") as f:
         return HTMLResponse(content=f.read())
 
 # Get training data
-@app.get("/admin/data")
+@admin.get("/admin/data")
 async def get_training_data(credentials: HTTPBasicCredentials = Depends(security)):
     verify_admin(credentials)
-    return JSONResponse(content=training_data)
+    return JSONResponse(content=service.knowledge.snapshot.training_data)
 
 # Update training data
-@app.post("/admin/data")
+@admin.post("/admin/data")
 async def update_training_data(request: Request, credentials: HTTPBasicCredentials = Depends(security)):
     verify_admin(credentials)
     try:
@@ -131,96 +89,74 @@ async def update_training_data(request: Request, credentials: HTTPBasicCredentia
             if key not in data:
                 raise ValueError(f"Missing required key: {key}")
 
-        # Save backup
-        try:
-            backup_path = f"training_data_backup_{int(time.time())}.json"
-            with open("training_data.json", "r", encoding="utf-8") as f:
-                current_data = f.read()
-            with open(backup_path, "w", encoding="utf-8") as f:
-                f.write(current_data)
-        except Exception:
-            pass
-
-        # Save new data
-        with open("training_data.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-
-        # Reload training data
-        global training_data
-        training_data = load_training_data()
-
-        return JSONResponse(content={"status": "success", "message": "Training data updated"})
+        def save():
+            # Atomic write; the previous version is kept in the compressed history
+            version = data_history.commit(json.dumps(data, indent=4, ensure_ascii=False))
+
+            # Swap in the new snapshot here; other workers pick up the file change on their next poll
+            service.knowledge.reload(force=True)
+            return version
+
+        # Disk I/O and the rebuild run off the event loop, so chats keep flowing
+        version = await run_in_threadpool(save)
+
+        return JSONResponse(content={
+            "status": "success",
+            "message": "Training data updated",
+            "version": version
+        })
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# List saved versions of the training data, newest first
+@admin.get("/admin/data/versions")
+async def list_training_data_versions(credentials: HTTPBasicCredentials = Depends(security)):
+    verify_admin(credentials)
+    versions = await run_in_threadpool(data_history.versions)
+    return JSONResponse(content={"keep": data_history.keep, "versions": versions})
+
+# Get one saved version
+@admin.get("/admin/data/versions/{version}")
+async def get_training_data_version(version: str, credentials: HTTPBasicCredentials = Depends(security)):
+    verify_admin(credentials)
+    try:
+        text = await run_in_threadpool(data_history.load, version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown version: {version}")
+    return JSONResponse(content=json.loads(text))
+
+# Restore a saved version
+@admin.post("/admin/data/rollback/{version}")
+async def rollback_training_data(version: str, credentials: HTTPBasicCredentials = Depends(security)):
+    verify_admin(credentials)
+
+    def rollback():
+        restored = data_history.rollback(version)
+        service.knowledge.reload(force=True)
+        return restored
+
+    try:
+        restored = await run_in_threadpool(rollback)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown version: {version}")
+    return JSONResponse(content={
+        "status": "success",
+        "message": f"Training data rolled back to {restored}",
+        "version": restored
+    })
+
+if ADMIN_USERNAME and ADMIN_PASSWORD:
+    app.include_router(admin)
+else:
+    print("Admin routes disabled: set ADMIN_USERNAME and ADMIN_PASSWORD to enable them")
+
 # Add favicon route
 @app.get('/favicon.ico')
 async def favicon():
     return FileResponse('static/favicon.ico')
 
-@app.post("/chat")
-async def chat(request: ChatRequest):
-    try:
-        if not MISTRAL_API_KEY:
-            print("Error: MISTRAL_API_KEY not set")
-            return {"response": "I apologize, but I'm temporarily unavailable. Please try again in a few moments."}
-        
-        # Sanitize input
-        message = request.message.strip()
-        if not message:
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
-            
-        print(f"Debug: Processing chat request: {message[:50]}...")
-        
-        # Prepare headers and data
-        headers = {
-            "Authorization": f"Bearer {MISTRAL_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "mistral-small-latest",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": f"You are a helpful customer service assistant for Souqcoom. Respond in {request.language}."
-                },
-                {
-                    "role": "user",
-                    "content": message
-                }
-            ],
-            "temperature": 0.7,
-            "max_tokens": 500
-        }
-        
-        # Make API request with retry logic
-        for attempt in range(3):
-            try:
-                print(f"Debug: Sending request to Mistral API (attempt {attempt + 1})...")
-                response = requests.post(API_ENDPOINT, headers=headers, json=data, timeout=10)
-                response.raise_for_status()
-                
-                response_content = response.json()['choices'][0]['message']['content']
-                print(f"Debug: Received response: {response_content[:50]}...")
-                return {"response": response_content}
-                
-            except requests.exceptions.RequestException as e:
-                print(f"API request attempt {attempt + 1} failed: {str(e)}")
-                if attempt == 2:  # Last attempt
-                    return {"response": "I apologize, but I'm having trouble connecting. Please try again in a moment."}
-                time.sleep(1)  # Wait before retrying
-                
-    except Exception as e:
-        print(f"Unexpected error in chat endpoint: {str(e)}")
-        return {"response": "I apologize, but I encountered an error. Please try again."}
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy", "api_configured": bool(MISTRAL_API_KEY)}
-
 if __name__ == "__main__":
     # Example usage
     prompt = "Write a short poem about coding"
@@ -0,0 +1,324 @@
+import atexit
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from file_utils import atomic_write_text
+
+# Shared directory where every process (gunicorn workers, CLI tools) writes its
+# metrics, so /metrics on any worker reports the totals. Unset: per-process only.
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Route or tool a Mistral call is made for; set by the HTTP middleware and CLI tools
+current_endpoint = contextvars.ContextVar("metrics_endpoint", default="unknown")
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _changed()
+
+    def dump(self):
+        return {"type": "counter", "values": [[list(key), value] for key, value in self.values.items()]}
+
+    @staticmethod
+    def merge(into, dumped):
+        for key, value in dumped["values"]:
+            into[tuple(key)] = into.get(tuple(key), 0) + value
+
+    def render(self, values):
+        lines = [f"# TYPE {self.name} counter", f"# HELP {self.name} {self.documentation}"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}_total{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+        _changed()
+
+    def dump(self):
+        return {"type": "histogram", "values": [[list(key), state] for key, state in self.values.items()]}
+
+    @staticmethod
+    def merge(into, dumped):
+        for key, state in dumped["values"]:
+            current = into.setdefault(tuple(key), [0] * len(state))
+            for i, value in enumerate(state):
+                current[i] += value
+
+    def render(self, values):
+        lines = [f"# TYPE {self.name} histogram", f"# HELP {self.name} {self.documentation}"]
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(state[-1])}")
+        return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+_lock = threading.Lock()
+# Set on every update; the flusher thread writes a snapshot only when something changed
+_dirty = False
+# Pid the flusher thread runs in; a forked worker does not inherit the thread, so it starts its own
+_flusher_pid = None
+
+UPSTREAM_LATENCY = Histogram(
+    "mistral_request_duration_seconds", "Mistral call latency including retries", ("model", "endpoint", "outcome")
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "mistral_time_to_first_token_seconds", "Time until the first streamed token", ("model", "endpoint")
+)
+UPSTREAM_REQUESTS = Counter("mistral_requests", "Mistral calls by final outcome", ("model", "endpoint", "outcome"))
+RETRIES = Counter("mistral_retries", "Mistral attempts that were retried, by reason", ("model", "endpoint", "reason"))
+RATE_LIMITED = Counter("mistral_rate_limited", "Mistral responses with status 429", ("model", "endpoint"))
+PROMPT_TOKENS = Counter("mistral_prompt_tokens", "Prompt tokens sent to Mistral", ("model", "endpoint"))
+COMPLETION_TOKENS = Counter("mistral_completion_tokens", "Completion tokens returned by Mistral", ("model", "endpoint"))
+REJECTED = Counter(
+    "mistral_rejected", "Mistral calls refused locally (circuit open or no slot in time)", ("model", "endpoint", "reason")
+)
+CIRCUIT_OPENED = Counter("mistral_circuit_opened", "Times the Mistral circuit breaker opened", ())
+FALLBACKS = Counter("upstream_fallbacks", "Answers served without Mistral after it failed", ("endpoint", "result"))
+SINGLE_FLIGHT = Counter(
+    "single_flight_requests", "Requests that started (leader) or joined (follower) a Mistral call", ("endpoint", "role")
+)
+QA_PARSED_CHUNKS = Counter(
+    "qa_parsed_chunks", "Chunks whose Q&A generation output was parsed (3 pairs are asked per chunk)", ("endpoint",)
+)
+QA_PAIRS = Counter("qa_pairs", "Q&A pairs recovered from model output", ("endpoint",))
+QA_MALFORMED = Counter("qa_malformed_objects", "JSON objects in Q&A model output that could not be parsed", ("endpoint",))
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "End-to-end request latency", ("app", "route", "method", "status")
+)
+
+METRICS = [
+    UPSTREAM_LATENCY, TIME_TO_FIRST_TOKEN, UPSTREAM_REQUESTS, RETRIES, RATE_LIMITED,
+    PROMPT_TOKENS, COMPLETION_TOKENS, REJECTED, CIRCUIT_OPENED, FALLBACKS, SINGLE_FLIGHT,
+    QA_PARSED_CHUNKS, QA_PAIRS, QA_MALFORMED, HTTP_LATENCY,
+]
+
+
+@contextmanager
+def endpoint(name):
+    """Attribute Mistral calls made inside the block to name"""
+    token = current_endpoint.set(name)
+    try:
+        yield
+    finally:
+        current_endpoint.reset(token)
+
+
+def observe_call(model, seconds, outcome, endpoint=None):
+    """Record one Mistral call (after any retries) that ended with outcome ("ok" or "error")"""
+    endpoint = endpoint or current_endpoint.get()
+    UPSTREAM_REQUESTS.inc(model=model, endpoint=endpoint, outcome=outcome)
+    UPSTREAM_LATENCY.observe(seconds, model=model, endpoint=endpoint, outcome=outcome)
+
+
+def count_retry(model, reason, endpoint=None):
+    """Record an attempt that will be retried; reason is the HTTP status or "network" """
+    endpoint = endpoint or current_endpoint.get()
+    RETRIES.inc(model=model, endpoint=endpoint, reason=reason)
+
+
+def count_rate_limited(model, endpoint=None):
+    """Record a 429 response, whether or not it is retried"""
+    RATE_LIMITED.inc(model=model, endpoint=endpoint or current_endpoint.get())
+
+
+def count_tokens(model, prompt_tokens, completion_tokens, endpoint=None):
+    endpoint = endpoint or current_endpoint.get()
+    PROMPT_TOKENS.inc(prompt_tokens, model=model, endpoint=endpoint)
+    COMPLETION_TOKENS.inc(completion_tokens, model=model, endpoint=endpoint)
+
+
+def observe_first_token(model, seconds, endpoint=None):
+    TIME_TO_FIRST_TOKEN.observe(seconds, model=model, endpoint=endpoint or current_endpoint.get())
+
+
+def count_rejected(model, reason, endpoint=None):
+    REJECTED.inc(model=model, endpoint=endpoint or current_endpoint.get(), reason=reason)
+
+
+def count_fallback(result, endpoint=None):
+    """Record a degraded answer; result is "faq" or "apology" """
+    FALLBACKS.inc(endpoint=endpoint or current_endpoint.get(), result=result)
+
+
+def count_single_flight(role, endpoint=None):
+    SINGLE_FLIGHT.inc(endpoint=endpoint or current_endpoint.get(), role=role)
+
+
+def count_qa_parse(chunks, pairs, malformed, endpoint=None):
+    """Record parsed Q&A output; qa_pairs_total / qa_parsed_chunks_total is the yield per chunk"""
+    endpoint = endpoint or current_endpoint.get()
+    QA_PARSED_CHUNKS.inc(chunks, endpoint=endpoint)
+    QA_PAIRS.inc(pairs, endpoint=endpoint)
+    if malformed:
+        QA_MALFORMED.inc(malformed, endpoint=endpoint)
+
+
+def observe_request(app, route, method, status, seconds):
+    HTTP_LATENCY.observe(seconds, app=app, route=route, method=method, status=status)
+
+
+def _snapshot_path():
+    return os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+
+
+def flush():
+    """Write this process's metrics to METRICS_DIR for the other processes to aggregate"""
+    global _dirty
+    if not METRICS_DIR:
+        return
+    with _lock:
+        dumped = {metric.name: metric.dump() for metric in METRICS}
+        _dirty = False
+    # A snapshot is rewritten every interval and rebuilt from memory, so it is not worth an fsync
+    atomic_write_text(_snapshot_path(), json.dumps(dumped), fsync=False)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        if _dirty:
+            try:
+                flush()
+            except OSError as e:
+                print(f"Could not write metrics snapshot: {e}")
+
+
+def _changed():
+    global _dirty, _flusher_pid
+    if not METRICS_DIR:
+        return
+    _dirty = True
+    if _flusher_pid != os.getpid():
+        with _lock:
+            if _flusher_pid == os.getpid():
+                return
+            _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_periodically, name="metrics-flush", daemon=True).start()
+
+
+atexit.register(flush)
+
+
+def render():
+    """All metrics in OpenMetrics text format, summed over every process sharing METRICS_DIR"""
+    merged = {metric.name: {} for metric in METRICS}
+    if METRICS_DIR:
+        # Other processes from their snapshots; this one from memory, which is newer than its file
+        own = _snapshot_path()
+        for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+            if os.path.abspath(path) == os.path.abspath(own):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    dumped = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric in METRICS:
+                if metric.name in dumped:
+                    metric.merge(merged[metric.name], dumped[metric.name])
+    with _lock:
+        for metric in METRICS:
+            metric.merge(merged[metric.name], metric.dump())
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render(merged[metric.name]))
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def clear_metrics_dir():
+    """Remove snapshots from earlier runs; call once before workers start (e.g. gunicorn on_starting)"""
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+            os.remove(path)
+
+
+def instrument_fastapi(app, app_name):
+    """Time every request end to end (streamed bodies until the last chunk) and serve /metrics"""
+    from fastapi import Request
+    from fastapi.responses import Response
+
+    @app.middleware("http")
+    async def record_request(request: Request, call_next):
+        start = time.perf_counter()
+        token = current_endpoint.set(request.url.path)
+        try:
+            response = await call_next(request)
+        finally:
+            current_endpoint.reset(token)
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        body = response.body_iterator
+
+        async def timed_body():
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                observe_request(app_name, route, request.method, response.status_code, time.perf_counter() - start)
+
+        response.body_iterator = timed_body()
+        return response
+
+    # Plain def: FastAPI runs it in its threadpool, so reading the snapshots never blocks the event loop
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint():
+        return Response(content=render(), media_type=OPENMETRICS_CONTENT_TYPE)
+
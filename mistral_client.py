@@ -0,0 +1,419 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+import metrics
+from text_utils import estimate_tokens
+from upstream_guard import AdaptiveLimiter, CircuitBreaker, backoff_delay, parse_retry_after
+
+# Load environment variables
+load_dotenv()
+
+API_ENDPOINT = os.getenv("MISTRAL_API_ENDPOINT", "https://api.mistral.ai/v1/chat/completions")
+DEFAULT_MODEL = "mistral-small-latest"
+
+# Pool and concurrency limits (per worker process)
+MAX_CONCURRENCY = int(os.getenv("MISTRAL_MAX_CONCURRENCY", "32"))
+MAX_CONNECTIONS = int(os.getenv("MISTRAL_MAX_CONNECTIONS", "64"))
+KEEPALIVE_CONNECTIONS = int(os.getenv("MISTRAL_KEEPALIVE_CONNECTIONS", "32"))
+REQUEST_TIMEOUT = float(os.getenv("MISTRAL_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("MISTRAL_MAX_RETRIES", "3"))
+RETRY_DELAY = float(os.getenv("MISTRAL_RETRY_DELAY", "1"))
+# Budget for one call, including waiting for a slot, retries and backoff
+DEADLINE = float(os.getenv("MISTRAL_DEADLINE", "30"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class MistralAPIError(Exception):
+    """Raised when the Mistral API cannot produce a completion"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UpstreamUnavailableError(MistralAPIError):
+    """Raised without calling Mistral: the circuit is open or no slot freed up before the deadline"""
+
+
+def _prompt_tokens(payload):
+    return sum(estimate_tokens(message.get("content") or "") for message in payload.get("messages", []))
+
+
+def _completion_tokens(result):
+    try:
+        return estimate_tokens(result["choices"][0]["message"]["content"] or "")
+    except (KeyError, IndexError, TypeError):
+        return 0
+
+
+class AsyncMistralClient:
+    """Pooled async client for the chat completions endpoint.
+
+    Calls pass a circuit breaker and an AIMD concurrency limit, retry with
+    jittered backoff, and give up once the per-call deadline is spent.
+    """
+
+    def __init__(self, api_key=None, endpoint=API_ENDPOINT, max_concurrency=MAX_CONCURRENCY,
+                 max_connections=MAX_CONNECTIONS, keepalive_connections=KEEPALIVE_CONNECTIONS,
+                 timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY,
+                 deadline=DEADLINE):
+        self.api_key = api_key if api_key is not None else os.getenv("MISTRAL_API_KEY")
+        self.endpoint = endpoint
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.deadline = deadline
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=keepalive_connections,
+        )
+        # Shared by every event loop in the process: an outage is an outage
+        self.breaker = CircuitBreaker(on_open=metrics.CIRCUIT_OPENED.inc)
+        # One pool and limiter per event loop (e.g. the server's loop and the
+        # background loop used by run_sync); neither can be shared across loops
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _pool(self):
+        """(client, limiter) for the running event loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            with self._pools_lock:
+                for other in [other for other in self._pools if other.is_closed()]:
+                    # Its connections went away with the loop; there is nothing left to await
+                    del self._pools[other]
+                pool = self._pools.get(loop)
+                if pool is None:
+                    client = httpx.AsyncClient(
+                        limits=self.limits,
+                        timeout=self.timeout,
+                        headers={
+                            "Authorization": f"Bearer {self.api_key}",
+                            "Content-Type": "application/json",
+                        },
+                    )
+                    pool = self._pools[loop] = (client, AdaptiveLimiter(self.max_concurrency))
+        return pool
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        """The running event loop's pool, created lazily"""
+        return self._pool()[0]
+
+    def _attempt_timeout(self, deadline):
+        return httpx.Timeout(max(0.001, min(self.timeout, deadline - time.monotonic())))
+
+    @asynccontextmanager
+    async def _upstream_slot(self, model, deadline):
+        """Pass the breaker and hold an AIMD slot for one attempt.
+
+        The body sets slot["status"] once the response status is known, and
+        optionally slot["latency"] (streams report time to headers). On exit
+        the outcome is fed to the breaker and the limiter.
+        """
+        if not self.breaker.allow():
+            metrics.count_rejected(model, "circuit_open")
+            raise UpstreamUnavailableError(
+                f"Mistral circuit open; next attempt in {self.breaker.retry_after():.0f}s", 503
+            )
+        probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+        limiter = self._pool()[1]
+        try:
+            if not limiter.try_acquire():
+                try:
+                    await asyncio.wait_for(limiter.acquire(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    metrics.count_rejected(model, "queue_timeout")
+                    raise UpstreamUnavailableError("No Mistral request slot freed up before the deadline", 503)
+
+            slot = {"status": None, "latency": None, "start": time.perf_counter(), "model": model}
+            try:
+                yield slot
+            except BaseException as e:
+                if isinstance(e, httpx.TransportError):
+                    # Timeouts and connection errors: the upstream is struggling
+                    self.breaker.record_failure()
+                    limiter.release(congested=True)
+                else:
+                    self._settle(slot, limiter)
+                raise
+            self._settle(slot, limiter)
+        finally:
+            if probe:
+                # Success and failure already moved the breaker on; any other outcome frees the probe
+                self.breaker.release_probe()
+
+    def _settle(self, slot, limiter):
+        status = slot["status"]
+        if status is None:
+            limiter.release()
+        elif status == 429:
+            # Throttled, not down: shrink concurrency; a half-open probe closes the breaker
+            metrics.count_rate_limited(slot["model"])
+            self.breaker.record_throttled()
+            limiter.release(congested=True)
+        elif status >= 500:
+            self.breaker.record_failure()
+            limiter.release(congested=True)
+        else:
+            self.breaker.record_success()
+            latency = slot["latency"] if slot["latency"] is not None else time.perf_counter() - slot["start"]
+            limiter.release(latency=latency)
+
+    async def _backoff(self, model, attempt, error, retry_after, deadline):
+        """Sleep before the next attempt; False if the retries or the deadline are used up"""
+        if attempt >= self.max_retries - 1:
+            return False
+        delay = max(retry_after or 0.0, backoff_delay(attempt, self.retry_delay))
+        if time.monotonic() + delay >= deadline:
+            return False
+        metrics.count_retry(model, error.status_code or "network")
+        await asyncio.sleep(delay)
+        return True
+
+    def stats(self):
+        try:
+            pool = self._pools.get(asyncio.get_running_loop())
+        except RuntimeError:
+            pool = None
+        return {
+            "circuit": self.breaker.stats(),
+            "concurrency": pool[1].stats() if pool is not None else None,
+        }
+
+    async def complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a completion payload and return the decoded JSON body"""
+        if not self.api_key:
+            raise MistralAPIError("MISTRAL_API_KEY not set")
+
+        client = self._ensure_client()
+        model = payload.get("model", DEFAULT_MODEL)
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.deadline
+        last_error = None
+        for attempt in range(self.max_retries):
+            retry_after = None
+            try:
+                async with self._upstream_slot(model, deadline) as slot:
+                    response = await client.post(self.endpoint, json=payload, timeout=self._attempt_timeout(deadline))
+                    slot["status"] = response.status_code
+                if response.status_code in RETRYABLE_STATUS:
+                    last_error = MistralAPIError(
+                        f"Mistral API returned {response.status_code}", response.status_code
+                    )
+                    if response.status_code == 429:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"), None)
+                else:
+                    response.raise_for_status()
+                    result = response.json()
+                    metrics.observe_call(model, time.perf_counter() - start, "ok")
+                    usage = result.get("usage") or {}
+                    metrics.count_tokens(
+                        model,
+                        usage.get("prompt_tokens", _prompt_tokens(payload)),
+                        usage.get("completion_tokens", _completion_tokens(result)),
+                    )
+                    return result
+            except UpstreamUnavailableError:
+                metrics.observe_call(model, time.perf_counter() - start, "rejected")
+                raise
+            except httpx.HTTPStatusError as e:
+                metrics.observe_call(model, time.perf_counter() - start, "error")
+                raise MistralAPIError(str(e), e.response.status_code)
+            except httpx.HTTPError as e:
+                last_error = MistralAPIError(str(e) or type(e).__name__)
+
+            print(f"API request attempt {attempt + 1} failed: {last_error}")
+            if not await self._backoff(model, attempt, last_error, retry_after, deadline):
+                break
+
+        metrics.observe_call(model, time.perf_counter() - start, "error")
+        raise last_error
+
+    async def chat(self, messages: List[Dict[str, str]], model: str = DEFAULT_MODEL,
+                   temperature: float = 0.7, max_tokens: Optional[int] = None) -> str:
+        """Return the assistant message content for a list of chat messages"""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        result = await self.complete(payload)
+        try:
+            return result["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise MistralAPIError("Malformed completion response")
+
+    async def stream_chat(self, messages: List[Dict[str, str]], model: str = DEFAULT_MODEL,
+                          temperature: float = 0.7, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield content deltas as Mistral streams them (`stream: true`)"""
+        if not self.api_key:
+            raise MistralAPIError("MISTRAL_API_KEY not set")
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+        }
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+
+        client = self._ensure_client()
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.deadline
+        last_error = None
+        for attempt in range(self.max_retries):
+            started = False
+            completion_tokens = 0
+            usage = None
+            retry_after = None
+            try:
+                async with self._upstream_slot(model, deadline) as slot:
+                    async with client.stream("POST", self.endpoint, json=payload,
+                                             timeout=self._attempt_timeout(deadline)) as response:
+                        slot["status"] = response.status_code
+                        slot["latency"] = time.perf_counter() - slot["start"]
+                        if response.status_code in RETRYABLE_STATUS:
+                            last_error = MistralAPIError(
+                                f"Mistral API returned {response.status_code}", response.status_code
+                            )
+                            if response.status_code == 429:
+                                retry_after = parse_retry_after(response.headers.get("Retry-After"), None)
+                        else:
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    break
+                                chunk = json.loads(data)
+                                # The final chunk may carry token usage for the whole stream
+                                usage = chunk.get("usage") or usage
+                                if not chunk.get("choices"):
+                                    continue
+                                delta = chunk["choices"][0].get("delta", {}).get("content")
+                                if delta:
+                                    if not started:
+                                        metrics.observe_first_token(model, time.perf_counter() - start)
+                                    started = True
+                                    completion_tokens += estimate_tokens(delta)
+                                    yield delta
+                            metrics.observe_call(model, time.perf_counter() - start, "ok")
+                            usage = usage or {}
+                            metrics.count_tokens(
+                                model,
+                                usage.get("prompt_tokens", _prompt_tokens(payload)),
+                                usage.get("completion_tokens", completion_tokens),
+                            )
+                            return
+            except UpstreamUnavailableError:
+                metrics.observe_call(model, time.perf_counter() - start, "rejected")
+                raise
+            except httpx.HTTPStatusError as e:
+                metrics.observe_call(model, time.perf_counter() - start, "error")
+                raise MistralAPIError(str(e), e.response.status_code)
+            except (httpx.HTTPError, ValueError, KeyError, IndexError) as e:
+                last_error = MistralAPIError(str(e) or type(e).__name__)
+
+            # Retrying after tokens were sent would duplicate output
+            if started:
+                metrics.observe_call(model, time.perf_counter() - start, "error")
+                raise last_error
+            print(f"API stream attempt {attempt + 1} failed: {last_error}")
+            if not await self._backoff(model, attempt, last_error, retry_after, deadline):
+                break
+
+        metrics.observe_call(model, time.perf_counter() - start, "error")
+        raise last_error
+
+    async def aclose(self):
+        """Close every loop's pool, each on the loop that owns it"""
+        with self._pools_lock:
+            pools, self._pools = self._pools, {}
+        current = asyncio.get_running_loop()
+        for loop, (client, _) in pools.items():
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop))
+
+
+class _BackgroundLoop:
+    """Event loop on a daemon thread, so sync callers share one async pool"""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def run(self, coro):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def iterate(self, agen):
+        """Drive an async generator on the background loop, one item at a time"""
+        while True:
+            try:
+                yield self.run(agen.__anext__())
+            except StopAsyncIteration:
+                return
+
+
+_shared_client = None
+_background_loop = _BackgroundLoop()
+
+
+def get_client() -> AsyncMistralClient:
+    """Return the process-wide shared client"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AsyncMistralClient()
+    return _shared_client
+
+
+def run_sync(coro):
+    """Run a client coroutine from synchronous code (Flask, CLI scripts)"""
+    return _background_loop.run(coro)
+
+
+def iter_sync(agen):
+    """Iterate an async generator such as `stream_chat` from synchronous code"""
+    return _background_loop.iterate(agen)
+
+
+def sse_event(data, event=None) -> str:
+    """Format one Server-Sent Event; non-string payloads are sent as JSON"""
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False)
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+async def close_client():
+    if _shared_client is not None:
+        await _shared_client.aclose()
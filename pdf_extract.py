@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+from collections import Counter
+
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+OCR_DPI = int(os.getenv("PDF_OCR_DPI", "200"))
+
+
+def _pdfplumber_page(pdf_path, page_index):
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path, pages=[page_index + 1]) as pdf:
+        return pdf.pages[0].extract_text() or ""
+
+
+def _ocr_page(pdf_path, page_index):
+    """Rasterize a single page and OCR it, so only one image is held at a time"""
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    images = convert_from_path(pdf_path, dpi=OCR_DPI, first_page=page_index + 1, last_page=page_index + 1)
+    try:
+        return pytesseract.image_to_string(images[0]) if images else ""
+    finally:
+        for image in images:
+            image.close()
+
+
+def extract_page_range(pdf_path, start, end, ocr=True):
+    """Extract pages [start, end) with the cheapest method that yields text for each page.
+
+    Returns a list of (page_index, text, method) tuples.
+    """
+    import PyPDF2
+
+    results = []
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file, strict=False)
+        for page_index in range(start, end):
+            text, method = "", None
+            try:
+                text = reader.pages[page_index].extract_text() or ""
+                method = "pypdf2"
+            except Exception as e:
+                print(f"Warning: PyPDF2 failed on page {page_index + 1}: {str(e)}")
+
+            if not text.strip():
+                try:
+                    text = _pdfplumber_page(pdf_path, page_index)
+                    method = "pdfplumber"
+                except Exception as e:
+                    print(f"Warning: pdfplumber failed on page {page_index + 1}: {str(e)}")
+
+            # Only pages without a text layer pay for OCR
+            if not text.strip() and ocr:
+                try:
+                    text = _ocr_page(pdf_path, page_index)
+                    method = "ocr"
+                except Exception as e:
+                    print(f"Warning: OCR failed on page {page_index + 1}: {str(e)}")
+
+            results.append((page_index, text if text.strip() else "", method if text.strip() else None))
+    return results
+
+
+def count_pages(pdf_path):
+    import PyPDF2
+
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file, strict=False).pages)
+
+
+def _extract_range_task(args):
+    return extract_page_range(*args)
+
+
+def _mp_context():
+    # iter_pages runs on batch_ingest's threads, and forking a threaded process can
+    # deadlock on a lock some other thread held; start workers from a clean process
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _page_ranges(page_indices, pages_per_task):
+    """Group sorted page indices into contiguous [start, end) ranges of at most pages_per_task"""
+    ranges = []
+    for page_index in page_indices:
+        if ranges and ranges[-1][1] == page_index and ranges[-1][1] - ranges[-1][0] < pages_per_task:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([page_index, page_index + 1])
+    return ranges
+
+
+def iter_pages(pdf_path, max_workers=PDF_EXTRACT_WORKERS, pages_per_task=PAGES_PER_TASK, ocr=True, stats=None,
+               page_indices=None):
+    """Yield (page_index, text) in page order, extracting page ranges across a process pool.
+
+    page_indices restricts extraction to those pages. If a stats Counter is given,
+    it counts pages per extraction method.
+    """
+    if page_indices is None:
+        page_indices = range(count_pages(pdf_path))
+    tasks = [
+        (pdf_path, start, end, ocr)
+        for start, end in _page_ranges(sorted(page_indices), pages_per_task)
+    ]
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        batches = map(_extract_range_task, tasks)
+        executor = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)), mp_context=_mp_context())
+        batches = executor.map(_extract_range_task, tasks)
+
+    try:
+        for batch in batches:
+            for page_index, text, method in batch:
+                if stats is not None:
+                    stats[method or "empty"] += 1
+                yield page_index, text
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def extract_text(pdf_path, max_workers=PDF_EXTRACT_WORKERS, ocr=True):
+    """Extract the whole document's text page by page"""
+    stats = Counter()
+    pages = [text for _, text in iter_pages(pdf_path, max_workers=max_workers, ocr=ocr, stats=stats)]
+    print(f"Extracted {len(pages)} pages ({', '.join(f'{k}: {v}' for k, v in sorted(stats.items()))})")
+    return "\n".join(page for page in pages if page)
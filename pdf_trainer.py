@@ -1,23 +1,24 @@
 import os
-import json
-import PyPDF2
-import requests
-import nltk
-from nltk.tokenize import sent_tokenize
+from itertools import chain
 from dotenv import load_dotenv
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
-import torch
-import time
-import pdfplumber
-from pdf2image import convert_from_path
-import pytesseract
+from pdf_extract import extract_text
+from ingest_cache import merge_training_examples, training_example
+from ingest_job import IngestJob
+from qa_pipeline import (
+    QA_BATCH_SIZE, QA_CONCURRENCY, QA_REQUESTS_PER_MINUTE, batch_payload, create_session, parse_batch_pairs,
+    parse_qa_pairs, post_completion,
+)
+from rate_limiter import TokenBucket
+from embeddings import EmbeddingService, chunk_items, qa_items
+from text_splitter import RecursiveTextSplitter
 
-# Download required NLTK data
-nltk.download('punkt')
+# Heavy optional backends (requests, numpy, sentence-transformers/torch,
+# pdfplumber, pdf2image, pytesseract) are imported on first use, so importing
+# this module and creating a PDFTrainer stay fast.
+EMBED_PDFS = os.getenv("EMBED_PDFS", "1") == "1"
 
 class PDFTrainer:
-    def __init__(self):
+    def __init__(self, concurrency=QA_CONCURRENCY, requests_per_minute=QA_REQUESTS_PER_MINUTE, batch_size=QA_BATCH_SIZE):
         load_dotenv()
         self.api_key = os.getenv("MISTRAL_API_KEY")
         if not self.api_key:
@@ -28,93 +29,62 @@ class PDFTrainer:
             "Content-Type": "application/json"
         }
         
-        # Initialize sentence transformer model
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Shared connection pool and rate limit for Q&A generation
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.session = create_session(concurrency)
+        self.rate_limiter = TokenBucket(requests_per_minute, burst=concurrency)
+        
+        # Chunks stream out of the page iterator as soon as they are complete
+        self.splitter = RecursiveTextSplitter()
+        
+        # Sentence transformer model, created only when embeddings are needed
+        self.embedder = EmbeddingService()
         
         # Create directories if they don't exist
         os.makedirs("training_data", exist_ok=True)
         os.makedirs("pdfs", exist_ok=True)
 
+    @property
+    def model(self):
+        """Sentence embedding model, loaded on first use"""
+        return self.embedder.model
+
+    def embed_pdf(self, pdf_path, chunks, qa_pairs):
+        """Add vectors for new chunks and Q&A pairs to the on-disk vector store"""
+        from ann_index import load_ann_index
+        from vector_store import VectorStore
+
+        source = os.path.basename(pdf_path)
+        store = VectorStore(model=self.embedder.model_name)
+        added = self.embedder.embed_into(store, chain(chunk_items(chunks, source), qa_items(qa_pairs, source)))
+        print(f"Added {added} vectors to {store.path} ({len(store)} total)")
+        
+        # Bring the search index up to date with the new rows
+        load_ann_index(store).save()
+        return added
+
     def extract_text_from_pdf(self, pdf_path):
-        """Extract text from a PDF file with multiple fallback methods"""
+        """Extract text page by page, using the cheapest working method for each page"""
         print(f"Extracting text from {pdf_path}")
         
-        # Method 1: Try PyPDF2
-        try:
-            text = ""
-            with open(pdf_path, 'rb') as file:
-                # Add error checking for PDF header
-                header = file.read(5)
-                if header != b'%PDF-':
-                    print("Warning: File does not start with PDF header")
-                file.seek(0)  # Reset to start of file
-                
-                try:
-                    pdf_reader = PyPDF2.PdfReader(file, strict=False)
-                    if len(pdf_reader.pages) == 0:
-                        raise ValueError("No pages found in PDF")
-                    
-                    for page in pdf_reader.pages:
-                        try:
-                            page_text = page.extract_text()
-                            if page_text:
-                                text += page_text + "\n"
-                        except Exception as e:
-                            print(f"Warning: Error extracting text from page: {str(e)}")
-                            continue
-                    
-                    if text.strip():
-                        return text
-                except Exception as e:
-                    print(f"PyPDF2 extraction failed: {str(e)}")
-            
-            # If PyPDF2 failed or extracted no text, try alternative method
-            if not text.strip():
-                raise ValueError("No text extracted with PyPDF2")
-                
-        except Exception as primary_error:
-            print(f"Primary PDF extraction failed: {str(primary_error)}")
-            
-            # Method 2: Try pdfplumber as fallback
-            try:
-                with pdfplumber.open(pdf_path) as pdf:
-                    text = ""
-                    for page in pdf.pages:
-                        try:
-                            text += page.extract_text() + "\n"
-                        except Exception as e:
-                            print(f"Warning: pdfplumber page extraction error: {str(e)}")
-                            continue
-                    
-                    if text.strip():
-                        return text
-            except Exception as e:
-                print(f"pdfplumber extraction failed: {str(e)}")
-            
-            # Method 3: Try pdf2image + pytesseract as last resort
-            try:
-                print("Attempting OCR extraction...")
-                images = convert_from_path(pdf_path)
-                text = ""
-                
-                for i, image in enumerate(images):
-                    try:
-                        page_text = pytesseract.image_to_string(image)
-                        text += page_text + "\n"
-                    except Exception as e:
-                        print(f"Warning: OCR extraction error on page {i}: {str(e)}")
-                        continue
-                
-                if text.strip():
-                    return text
-                
-            except Exception as e:
-                print(f"OCR extraction failed: {str(e)}")
+        with open(pdf_path, 'rb') as file:
+            # Add error checking for PDF header
+            header = file.read(5)
+            if header != b'%PDF-':
+                print("Warning: File does not start with PDF header")
+        
+        # PyPDF2, then pdfplumber, then OCR per page, fanned out across a process pool
+        text = extract_text(pdf_path)
+        if text.strip():
+            return text
         
         raise Exception("All PDF extraction methods failed")
 
     def download_from_google_drive(self, url, output_path):
         """Download a file from Google Drive"""
+        import requests
+        
         try:
             # Extract file ID from Google Drive URL
             file_id = None
@@ -165,6 +135,8 @@ class PDFTrainer:
 
     def download_pdf(self, url, output_path):
         """Download a PDF file with proper error handling"""
+        import requests
+        
         try:
             # Check if it's a Google Drive URL
             if 'drive.google.com' in url:
@@ -204,12 +176,7 @@ class PDFTrainer:
 
     def process_text_into_chunks(self, text):
         """Split text into manageable chunks"""
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        return text_splitter.split_text(text)
+        return self.splitter.split_text(text)
 
     def generate_qa_pairs(self, chunk):
         """Generate Q&A pairs from a text chunk using Mistral AI"""
@@ -222,82 +189,69 @@ class PDFTrainer:
             
             Generate natural questions that could be asked about this text."""
 
-            response = requests.post(
-                "https://api.mistral.ai/v1/chat/completions",
-                headers=self.headers,
-                json={
+            content = post_completion(
+                self.session,
+                self.headers,
+                {
                     "model": "mistral-small-latest",
                     "messages": [{"role": "user", "content": prompt}],
                     "temperature": 0.7
-                }
+                },
+                self.rate_limiter,
+                endpoint="pdf_trainer"
             )
-            response.raise_for_status()
             
-            # Parse the response and extract Q&A pairs
-            content = response.json()['choices'][0]['message']['content']
-            # Assuming the model returns properly formatted JSON
-            qa_pairs = []
-            try:
-                # Split the content by newlines and try to parse each line as JSON
-                for line in content.split('\n'):
-                    line = line.strip()
-                    if line and line.startswith('{') and line.endswith('}'):
-                        qa_pair = json.loads(line)
-                        if 'question' in qa_pair and 'answer' in qa_pair:
-                            qa_pairs.append(qa_pair)
-            except json.JSONDecodeError:
-                print("Error parsing Q&A pairs from model response")
-            
-            return qa_pairs
+            # Pairs may come as JSON lines, an array, a fenced block or span several lines
+            return parse_qa_pairs(content, endpoint="pdf_trainer")
         except Exception as e:
             print(f"Error generating Q&A pairs: {str(e)}")
             return []
 
+    def generate_qa_pairs_batch(self, chunks):
+        """Generate Q&A pairs for several chunks in one request; None for chunks missing from the reply"""
+        content = post_completion(self.session, self.headers, batch_payload(chunks), self.rate_limiter,
+                                  endpoint="pdf_trainer")
+        return parse_batch_pairs(content, len(chunks), endpoint="pdf_trainer")
+
     def create_training_examples(self, qa_pairs):
         """Convert Q&A pairs into training examples"""
-        examples = []
-        for pair in qa_pairs:
-            example = {
-                "messages": [
-                    {"role": "user", "content": pair['question']},
-                    {"role": "assistant", "content": pair['answer']}
-                ]
-            }
-            examples.append(example)
-        return examples
+        return [training_example(pair) for pair in qa_pairs]
 
     def save_training_examples(self, examples, output_file):
-        """Save training examples to a JSONL file"""
-        with open(output_file, 'a', encoding='utf-8') as f:
-            for example in examples:
-                f.write(json.dumps(example) + '\n')
+        """Merge training examples into a JSONL file, skipping ones already present"""
+        return merge_training_examples(examples, output_file)
 
     def process_pdf(self, pdf_path):
         """Process a PDF file and generate training examples"""
-        # Extract text from PDF
-        text = self.extract_text_from_pdf(pdf_path)
-        if not text:
-            return False
+        # Pages (reused from earlier runs or extracted as needed) are split and
+        # sent for Q&A generation as they arrive, without building the whole text.
+        # Finished chunks are checkpointed, so an interrupted run resumes where it stopped.
+        job = IngestJob(pdf_path)
         
-        # Split text into chunks
-        chunks = self.process_text_into_chunks(text)
-        print(f"Split text into {len(chunks)} chunks")
+        # Generate training examples for new chunks only, several requests in flight
+        results = job.run(
+            self.generate_qa_pairs,
+            generate_batch=self.generate_qa_pairs_batch,
+            batch_size=self.batch_size,
+            max_workers=self.concurrency,
+        )
+        if not results:
+            raise Exception("All PDF extraction methods failed")
+        print(f"Split text into {len(results)} chunks")
+        all_pairs = [qa_pair for qa_pairs in results for qa_pair in qa_pairs]
         
-        # Generate training examples for each chunk
-        all_examples = []
-        for i, chunk in enumerate(chunks):
-            print(f"Processing chunk {i+1}/{len(chunks)}")
-            qa_pairs = self.generate_qa_pairs(chunk)
-            examples = self.create_training_examples(qa_pairs)
-            all_examples.extend(examples)
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(1)
+        # Embed chunks and Q&A pairs for semantic search; only new items are encoded.
+        # The pages are cached in the manifest now, so the chunks are streamed again.
+        if EMBED_PDFS:
+            try:
+                self.embed_pdf(pdf_path, self.splitter.split_pages(job.manifest.iter_text(pdf_path)), all_pairs)
+            except ImportError as e:
+                print(f"Skipping embeddings ({str(e)}). Install numpy and sentence-transformers to enable them.")
         
-        # Save training examples
+        # Compact the checkpoint log into the training file
         output_file = "training_data/training_examples.jsonl"
-        self.save_training_examples(all_examples, output_file)
-        print(f"Saved {len(all_examples)} training examples to {output_file}")
+        collected, added = job.compact(output_file)
+        print(f"Saved {added} new training examples to {output_file} ({collected} from this PDF)")
         return True
 
 def main():
@@ -0,0 +1,143 @@
+import os
+import threading
+from collections import namedtuple
+from typing import Dict
+
+from text_utils import estimate_tokens
+
+# Approximate token budgets for the precompiled part and for retrieved passages
+PROMPT_BASE_MAX_TOKENS = int(os.getenv("PROMPT_BASE_MAX_TOKENS", "600"))
+PROMPT_CONTEXT_MAX_TOKENS = int(os.getenv("PROMPT_CONTEXT_MAX_TOKENS", "600"))
+
+LANGUAGE_NAMES = {"en": "English", "ar": "Arabic"}
+
+PromptStats = namedtuple("PromptStats", ["system_tokens", "context_passages", "context_tokens", "user_tokens"])
+
+
+def localized(texts, language):
+    """Pick the text for language from a {language: text} dict, falling back to English"""
+    if not isinstance(texts, dict):
+        return texts
+    return texts.get(language) or texts.get("en") or next(iter(texts.values()), "")
+
+
+class PromptBuilder:
+    """System prompts compiled once per training-data version, plus budgeted context at request time"""
+
+    def __init__(self, training_data: Dict, base_max_tokens: int = PROMPT_BASE_MAX_TOKENS,
+                 context_max_tokens: int = PROMPT_CONTEXT_MAX_TOKENS):
+        self.training_data = training_data
+        self.base_max_tokens = base_max_tokens
+        self.context_max_tokens = context_max_tokens
+        self.compiled = {}
+        # Passage sources already covered by the compiled prompt, per language
+        self.covered = {}
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.context_tokens = 0
+        self._lock = threading.Lock()
+
+        languages = set(LANGUAGE_NAMES)
+        for faq in training_data.get("faqs", {}).values():
+            languages.update(faq.get("answer", {}))
+        for responses in training_data.get("common_responses", {}).values():
+            languages.update(responses)
+        for language in sorted(languages):
+            self._compile(language)
+
+    def _compile(self, language):
+        data = self.training_data
+        company = data.get("company_info", {})
+        name = company.get("name", "Souqcoom")
+        lines = [
+            f"You are a helpful customer service assistant for {name}. "
+            f"Respond in {LANGUAGE_NAMES.get(language, language)}. Be concise."
+        ]
+        # Source names match retrieval.passages_from_training_data
+        covered = set()
+        if company.get("description"):
+            lines.append(company["description"])
+            covered.add("company_info")
+        if company.get("values"):
+            lines.append("Values: " + "; ".join(company["values"]) + ".")
+            covered.add("company_info.values")
+        if data.get("product_categories"):
+            lines.append("Categories: " + ", ".join(data["product_categories"]) + ".")
+            covered.add("product_categories")
+        steps = data.get("support_workflow", {}).get("issue_resolution", {}).get("steps")
+        if steps:
+            lines.append("When resolving an issue: " + "; ".join(steps) + ".")
+
+        # FAQs and canned answers, in file order, while they fit the budget
+        budget = self.base_max_tokens - estimate_tokens("\n".join(lines))
+        facts = []
+        for topic, faq in data.get("faqs", {}).items():
+            question = localized(faq.get("question", {}), language)
+            answer = localized(faq.get("answer", {}), language)
+            if answer:
+                facts.append((f"faqs.{topic}", f"Q: {question} A: {answer}" if question else answer))
+        for topic, responses in data.get("common_responses", {}).items():
+            answer = localized(responses, language)
+            if answer:
+                facts.append((f"common_responses.{topic}", f"{topic.replace('_', ' ').capitalize()}: {answer}"))
+        for source, fact in facts:
+            cost = estimate_tokens(fact)
+            if cost > budget:
+                break
+            budget -= cost
+            covered.add(source)
+            lines.append(fact)
+
+        self.compiled[language] = "\n".join(lines)
+        self.covered[language] = covered
+
+    def resolve_language(self, language):
+        """language if a prompt was compiled for it, else English; requests cannot add languages"""
+        return language if language in self.compiled else "en"
+
+    def system_prompt(self, language):
+        return self.compiled[self.resolve_language(language)]
+
+    def build(self, message, language, results=(), max_passages=None):
+        """Chat messages for message, with retrieved (score, passage) results added to the
+        system prompt until max_passages or the context budget is reached.
+        Returns (messages, PromptStats).
+        """
+        language = self.resolve_language(language)
+        system_prompt = self.compiled[language]
+        covered = self.covered[language]
+        context, context_tokens = [], 0
+        for _, passage in results:
+            # Facts already in the compiled prompt are not repeated
+            if passage.source in covered:
+                continue
+            cost = estimate_tokens(passage.text)
+            if context_tokens + cost > self.context_max_tokens:
+                continue
+            context.append(passage.text)
+            context_tokens += cost
+            if max_passages is not None and len(context) >= max_passages:
+                break
+        if context:
+            system_prompt += "\n\nRelevant information:\n" + "\n\n".join(context)
+
+        stats = PromptStats(estimate_tokens(system_prompt), len(context), context_tokens, estimate_tokens(message))
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += stats.system_tokens + stats.user_tokens
+            self.context_tokens += context_tokens
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": message},
+        ]
+        return messages, stats
+
+    def stats(self):
+        requests = self.requests
+        return {
+            "requests": requests,
+            "avg_prompt_tokens": round(self.prompt_tokens / requests, 1) if requests else 0.0,
+            "avg_context_tokens": round(self.context_tokens / requests, 1) if requests else 0.0,
+            "base_prompt_tokens": {language: estimate_tokens(text) for language, text in self.compiled.items()},
+        }
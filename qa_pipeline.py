@@ -0,0 +1,320 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+import metrics
+from json_extract import JSONObjectExtractor, extract_objects
+from text_utils import estimate_tokens
+from upstream_guard import parse_retry_after
+
+# Load environment variables
+load_dotenv()
+
+# Same endpoint as mistral_client, read here so CLI tools don't import httpx
+API_ENDPOINT = os.getenv("MISTRAL_API_ENDPOINT", "https://api.mistral.ai/v1/chat/completions")
+
+# Q&A generation requests kept in flight, and the shared upstream budget
+QA_CONCURRENCY = int(os.getenv("QA_CONCURRENCY", "4"))
+QA_REQUESTS_PER_MINUTE = int(os.getenv("QA_REQUESTS_PER_MINUTE", "60"))
+QA_MAX_RETRIES = int(os.getenv("QA_MAX_RETRIES", "3"))
+
+# Chunks packed into one Q&A request (1 sends every chunk on its own), and the
+# estimated prompt tokens of chunk text allowed per batched request
+QA_BATCH_SIZE = int(os.getenv("QA_BATCH_SIZE", "8"))
+QA_BATCH_TOKENS = int(os.getenv("QA_BATCH_TOKENS", "3000"))
+# "<id>": key of a chunk in a batched reply, used when the reply is not valid JSON
+BATCH_ID_KEY = re.compile(r'"(\d+)"\s*:')
+# JSONL file that every raw Q&A reply is appended to (unset: nothing is recorded)
+QA_RECORD_RESPONSES = os.getenv("QA_RECORD_RESPONSES", "")
+# Completion tokens reserved per chunk in a batch (3 pairs fit comfortably)
+BATCH_COMPLETION_TOKENS = 250
+
+BATCH_SYSTEM_PROMPT = (
+    "You generate question-answer pairs from text. Reply with a single JSON object and nothing else."
+)
+BATCH_INSTRUCTIONS = """For each text below, generate 3 relevant question-answer pairs about that text only.
+Reply with one JSON object. Its keys are the text ids, and each value is a list of objects with
+"question" and "answer" keys, for example:
+{"1": [{"question": "What is X?", "answer": "X is Y."}], "2": [{"question": "How does Z work?", "answer": "Z works by..."}]}
+Include every id."""
+
+
+class RateLimitedError(Exception):
+    """Raised when a chunk is still rate limited after every retry"""
+
+
+def create_session(pool_size=QA_CONCURRENCY):
+    """requests.Session whose connection pool fits the number of workers"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def post_completion(session, headers, payload, limiter, max_retries=QA_MAX_RETRIES, timeout=60,
+                    endpoint="qa_generation"):
+    """Send one chat completion under the shared limiter and return the message content.
+
+    A 429 pauses the whole bucket for Retry-After seconds, so every worker backs off
+    together; other failures are retried with exponential backoff. Latency, tokens
+    and retries are recorded in metrics under endpoint.
+    """
+    import requests
+
+    model = payload.get("model", "unknown")
+    start = time.perf_counter()
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            response = session.post(API_ENDPOINT, headers=headers, json=payload, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            if attempt == max_retries:
+                metrics.observe_call(model, time.perf_counter() - start, "error", endpoint=endpoint)
+                raise
+            metrics.count_retry(model, "network", endpoint=endpoint)
+            wait_time = 2 ** (attempt + 1)
+            print(f"Request failed ({str(e)}). Retrying in {wait_time} seconds...")
+            time.sleep(wait_time)
+            continue
+
+        if response.status_code == 429:
+            metrics.count_rate_limited(model, endpoint=endpoint)
+            if attempt < max_retries:
+                metrics.count_retry(model, 429, endpoint=endpoint)
+            wait_time = parse_retry_after(response.headers.get("Retry-After"), min(2 ** (attempt + 1), 60))
+            print(f"\nRate limit hit. Pausing requests for {wait_time:.1f} seconds (retry {attempt + 1}/{max_retries})...")
+            limiter.pause(wait_time)
+            continue
+
+        if response.status_code >= 500 and attempt < max_retries:
+            metrics.count_retry(model, response.status_code, endpoint=endpoint)
+            time.sleep(2 ** (attempt + 1))
+            continue
+
+        try:
+            response.raise_for_status()
+            result = response.json()
+            content = result["choices"][0]["message"]["content"]
+        except Exception:
+            metrics.observe_call(model, time.perf_counter() - start, "error", endpoint=endpoint)
+            raise
+        metrics.observe_call(model, time.perf_counter() - start, "ok", endpoint=endpoint)
+        usage = result.get("usage") or {}
+        metrics.count_tokens(
+            model,
+            usage.get("prompt_tokens", sum(estimate_tokens(m.get("content") or "") for m in payload.get("messages", []))),
+            usage.get("completion_tokens", estimate_tokens(content or "")),
+            endpoint=endpoint,
+        )
+        return content
+
+    metrics.observe_call(model, time.perf_counter() - start, "error", endpoint=endpoint)
+    raise RateLimitedError(f"Still rate limited after {max_retries} retries")
+
+
+def generate_concurrently(chunks, generate, max_workers=QA_CONCURRENCY, on_result=None, unit="chunks"):
+    """Run generate(chunk) for every chunk with max_workers requests in flight.
+
+    chunks may be a lazy iterable; it is read only as requests complete (at most
+    2 * max_workers chunks are queued), so generation starts on the first chunk
+    while later ones are still being produced.
+    on_result(index, result) is called on the calling thread as chunks finish.
+    Returns the results in chunk order; failed chunks yield an empty list.
+    """
+    chunks = iter(chunks)
+    results = []
+    start = time.perf_counter()
+    done = 0
+    exhausted = False
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        while True:
+            while not exhausted and len(futures) < 2 * max_workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                futures[executor.submit(generate, chunk)] = len(results)
+                results.append([])
+            if not futures:
+                break
+
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = futures.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"Error generating Q&A pairs for chunk {i + 1}: {str(e)}")
+                done += 1
+                if on_result:
+                    on_result(i, results[i])
+                elapsed = time.perf_counter() - start
+                total = len(results) if exhausted else f"{len(results)}+"
+                print(f"Processed {done}/{total} {unit} ({done / elapsed:.2f} {unit}/sec)")
+
+    return results
+
+
+def batch_chunks(chunks, batch_size=QA_BATCH_SIZE, token_budget=QA_BATCH_TOKENS):
+    """Group chunks lazily into lists of at most batch_size whose estimated tokens fit token_budget.
+
+    A chunk larger than the budget is sent on its own.
+    """
+    batch, tokens = [], 0
+    for chunk in chunks:
+        chunk_tokens = estimate_tokens(chunk)
+        if batch and (len(batch) >= batch_size or tokens + chunk_tokens > token_budget):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(chunk)
+        tokens += chunk_tokens
+    if batch:
+        yield batch
+
+
+def batch_payload(batch, model="mistral-small-latest", temperature=0.7):
+    """Chat completion payload asking for Q&A pairs for every chunk, keyed by its 1-based id"""
+    texts = "\n\n".join(f'<text id="{i}">\n{chunk}\n</text>' for i, chunk in enumerate(batch, 1))
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": f"{BATCH_INSTRUCTIONS}\n\n{texts}"},
+        ],
+        "temperature": temperature,
+        "max_tokens": BATCH_COMPLETION_TOKENS * len(batch),
+        "response_format": {"type": "json_object"},
+    }
+
+
+_record_lock = threading.Lock()
+
+
+def record_response(content, chunks, batched, endpoint):
+    """Append a raw Q&A reply to QA_RECORD_RESPONSES, building a corpus for benchmarks/qa_parsing.py"""
+    if not QA_RECORD_RESPONSES:
+        return
+    line = json.dumps({"endpoint": endpoint, "chunks": chunks, "batched": batched, "content": content},
+                      ensure_ascii=False)
+    with _record_lock, open(QA_RECORD_RESPONSES, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def iter_qa_pairs(value):
+    """Every object with "question" and "answer" keys inside a parsed JSON value"""
+    if isinstance(value, dict):
+        if "question" in value and "answer" in value:
+            yield value
+            return
+        value = list(value.values())
+    if isinstance(value, list):
+        for item in value:
+            yield from iter_qa_pairs(item)
+
+
+def parse_qa_pairs(content, endpoint="qa_generation"):
+    """Q&A pairs in a single-chunk reply: JSON lines, arrays, fenced blocks or objects over several lines"""
+    record_response(content, 1, False, endpoint)
+    extractor = JSONObjectExtractor()
+    pairs = [pair for value in extractor.extract(content or "") for pair in iter_qa_pairs(value)]
+    metrics.count_qa_parse(1, len(pairs), extractor.malformed, endpoint=endpoint)
+    return pairs
+
+
+def parse_batch_pairs(content, count, endpoint="qa_generation"):
+    """Split a batched reply into per-chunk Q&A pair lists.
+
+    Accepts {"1": [...], "2": [...]} (one object or several) as well as
+    objects that carry their own "id". Returns count entries in chunk order;
+    a chunk missing from the reply or without a valid pair gets None, so it
+    can be retried on its own.
+    """
+    record_response(content, count, True, endpoint)
+    content = content or ""
+    ids = {str(i): i - 1 for i in range(1, count + 1)}
+    results = [[] for _ in range(count)]
+    extractor = JSONObjectExtractor()
+    for value in extractor.extract(content):
+        if "id" in value and str(value["id"]) in ids:
+            results[ids[str(value["id"])]].extend(iter_qa_pairs({k: v for k, v in value.items() if k != "id"}))
+            continue
+        for key, pairs in value.items():
+            if str(key).strip() in ids:
+                results[ids[str(key).strip()]].extend(iter_qa_pairs(pairs))
+
+    if extractor.malformed and not all(results):
+        # A broken or cut-off outer object: take the pairs between consecutive "<id>": keys
+        markers = [m for m in BATCH_ID_KEY.finditer(content) if m.group(1) in ids]
+        for marker, following in zip(markers, markers[1:] + [None]):
+            index = ids[marker.group(1)]
+            if not results[index]:
+                segment = content[marker.end():following.start() if following else len(content)]
+                results[index] = [pair for value in extract_objects(segment) for pair in iter_qa_pairs(value)]
+    metrics.count_qa_parse(count, sum(len(pairs) for pairs in results), extractor.malformed, endpoint=endpoint)
+    return [pairs or None for pairs in results]
+
+
+def generate_in_batches(chunks, generate_batch, generate, batch_size=QA_BATCH_SIZE, token_budget=QA_BATCH_TOKENS,
+                        max_workers=QA_CONCURRENCY, on_result=None):
+    """Like generate_concurrently, but sends chunks batch_size at a time through generate_batch.
+
+    generate_batch(chunks) returns one entry per chunk (None when that chunk is
+    missing from the reply). Missing chunks, and every chunk of a batch whose
+    request failed, are retried one by one with generate(chunk).
+    Returns the results in chunk order.
+    """
+    if batch_size <= 1:
+        return generate_concurrently(chunks, generate, max_workers=max_workers, on_result=on_result)
+
+    offsets = []
+    counts = {"chunks": 0, "requests": 0, "retried": 0}
+    lock = threading.Lock()
+
+    def batches():
+        for batch in batch_chunks(chunks, batch_size, token_budget):
+            offsets.append(counts["chunks"])
+            counts["chunks"] += len(batch)
+            yield batch
+
+    def run(batch):
+        try:
+            results = (list(generate_batch(batch)) + [None] * len(batch))[:len(batch)]
+        except Exception as e:
+            print(f"Batch of {len(batch)} chunks failed ({str(e)}); retrying them one by one")
+            results = [None] * len(batch)
+        retry = [j for j, qa_pairs in enumerate(results) if not qa_pairs]
+        with lock:
+            counts["requests"] += 1 + len(retry)
+            counts["retried"] += len(retry)
+        for j in retry:
+            try:
+                results[j] = generate(batch[j])
+            except Exception as e:
+                print(f"Error generating Q&A pairs for a retried chunk: {str(e)}")
+                results[j] = []
+        return results
+
+    def report(b, results):
+        if on_result:
+            for j, result in enumerate(results):
+                on_result(offsets[b] + j, result)
+
+    batch_results = generate_concurrently(batches(), run, max_workers=max_workers, on_result=report, unit="batches")
+    results = [result or [] for batch in batch_results for result in batch]
+    if counts["chunks"]:
+        print(
+            f"Batched {counts['chunks']} chunks into {counts['requests']} requests "
+            f"({counts['requests'] / counts['chunks']:.2f} requests/chunk, {counts['retried']} retried singly)"
+        )
+    return results
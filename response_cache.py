@@ -0,0 +1,169 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from text_utils import normalize_text, char_ngrams
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+# Cosine similarity for near-duplicate lookups; 0 disables them
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+
+
+class _Entry:
+    __slots__ = ("response", "expires_at", "size", "latency", "vector", "norm")
+
+    def __init__(self, response, expires_at, size, latency, vector, norm):
+        self.response = response
+        self.expires_at = expires_at
+        self.size = size
+        self.latency = latency
+        self.vector = vector
+        self.norm = norm
+
+
+class ResponseCache:
+    """LRU + TTL cache of model answers keyed on (normalized prompt, language, model, knowledge version)"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 ttl=RESPONSE_CACHE_TTL, similarity_threshold=RESPONSE_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._ngram_index = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(prompt, language="", model="", version=""):
+        return (normalize_text(prompt), language or "", model or "", version or "")
+
+    def get(self, prompt: str, language: str = "", model: str = "", version: str = "") -> Optional[str]:
+        """Return a cached answer for the prompt, or None on a miss"""
+        key = self.make_key(prompt, language, model, version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+
+            if entry is None and self.similarity_threshold > 0:
+                key = self._find_similar(key, now)
+                entry = self._entries.get(key) if key else None
+                if entry is not None:
+                    self.similar_hits += 1
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry.latency
+            return entry.response
+
+    def set(self, prompt: str, response: str, language: str = "", model: str = "", latency: float = 0.0,
+            version: str = ""):
+        """Store an answer; latency is the upstream time it cost, counted as saved on hits.
+
+        version is the knowledge version the answer was built from, so an answer
+        that finishes after a reload is never served for the new version.
+        """
+        key = self.make_key(prompt, language, model, version)
+        size = len(key[0].encode("utf-8")) + len(response.encode("utf-8"))
+        if not key[0] or size > self.max_bytes:
+            return
+
+        vector, norm = None, 0.0
+        if self.similarity_threshold > 0:
+            vector = char_ngrams(key[0])
+            norm = math.sqrt(sum(c * c for c in vector.values()))
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(response, time.monotonic() + self.ttl, size, latency, vector, norm)
+            self._bytes += size
+            if vector is not None:
+                for gram in vector:
+                    self._ngram_index.setdefault(gram, set()).add(key)
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if entry.vector is not None:
+            for gram in entry.vector:
+                keys = self._ngram_index.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._ngram_index[gram]
+
+    def _find_similar(self, key, now):
+        text, scope = key[0], key[1:]
+        query = char_ngrams(text)
+        query_norm = math.sqrt(sum(c * c for c in query.values()))
+        dots = {}
+        for gram, count in query.items():
+            for candidate in self._ngram_index.get(gram, ()):
+                if candidate[1:] == scope:
+                    dots[candidate] = dots.get(candidate, 0) + count * self._entries[candidate].vector[gram]
+
+        best_key, best_score = None, self.similarity_threshold
+        for candidate, dot in dots.items():
+            entry = self._entries[candidate]
+            score = dot / (query_norm * entry.norm)
+            if score >= best_score and entry.expires_at > now:
+                best_key, best_score = candidate, score
+        return best_key
+
+    def clear(self):
+        """Drop every entry, e.g. after the training data changes"""
+        with self._lock:
+            self._entries.clear()
+            self._ngram_index.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_upstream_seconds": round(self.saved_seconds, 3),
+        }
+
+
+_shared_cache = None
+
+
+def get_cache() -> ResponseCache:
+    """Return the process-wide response cache"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ResponseCache()
+    return _shared_cache
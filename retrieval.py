@@ -0,0 +1,201 @@
+import heapq
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter, namedtuple
+from typing import Dict, List
+
+from text_utils import normalize_text
+
+TRAINING_DATA_FILE = "training_data.json"
+TRAINING_EXAMPLES_FILE = "training_data/training_examples.jsonl"
+
+# Semantic search over the embedded PDF chunks and Q&A pairs (see vector_store.py)
+DENSE_RETRIEVAL = os.getenv("DENSE_RETRIEVAL", "0") == "1"
+# Same path as vector_store, read here so importing retrieval does not pull in numpy
+VECTOR_IDS_FILE = os.getenv("VECTOR_STORE_PATH", "training_data/vectors") + ".ids.jsonl"
+
+Passage = namedtuple("Passage", ["id", "source", "text", "language"])
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalized word tokens (see text_utils.normalize_text)"""
+    return normalize_text(text).split()
+
+
+def passages_from_training_data(data: Dict) -> List[Passage]:
+    """Flatten training_data.json into retrievable passages"""
+    passages = []
+
+    def add(source, text, language=None):
+        if text:
+            passages.append(Passage(len(passages), source, text, language))
+
+    company = data.get("company_info", {})
+    add("company_info", f"{company.get('name', '')}: {company.get('description', '')}", "en")
+    if company.get("values"):
+        add("company_info.values", "Our values: " + "; ".join(company["values"]), "en")
+
+    for topic, responses in data.get("common_responses", {}).items():
+        for language, text in responses.items():
+            add(f"common_responses.{topic}", f"{topic.replace('_', ' ')}: {text}", language)
+
+    for topic, faq in data.get("faqs", {}).items():
+        for language, answer in faq.get("answer", {}).items():
+            question = faq.get("question", {}).get(language, "")
+            add(f"faqs.{topic}", f"Q: {question}\nA: {answer}", language)
+
+    if data.get("product_categories"):
+        add("product_categories", "Product categories: " + ", ".join(data["product_categories"]), "en")
+
+    return passages
+
+
+def passages_from_examples(path: str, start_id: int = 0) -> List[Passage]:
+    """Read Q&A pairs from a training_examples.jsonl file"""
+    passages = []
+    if not os.path.exists(path):
+        return passages
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                messages = json.loads(line)["messages"]
+                question = next(m["content"] for m in messages if m["role"] == "user")
+                answer = next(m["content"] for m in messages if m["role"] == "assistant")
+            except (ValueError, KeyError, StopIteration):
+                continue
+            passages.append(Passage(start_id + len(passages), "training_examples", f"Q: {question}\nA: {answer}", None))
+    return passages
+
+
+class BM25Index:
+    """In-memory Okapi BM25 index over a fixed list of passages"""
+
+    def __init__(self, passages: List[Passage], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = []
+
+        for passage in passages:
+            counts = Counter(tokenize(passage.text))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((passage.id, tf))
+
+        n_docs = len(passages)
+        self.avg_length = (sum(self.doc_lengths) / n_docs) if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        # Per-document length normalisation, precomputed once
+        self.norms = [
+            self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for length in self.doc_lengths
+        ]
+
+    def search(self, query: str, k: int = 3):
+        """Return up to k (score, passage) pairs, best first"""
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in postings:
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.norms[doc_id])
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.passages[doc_id]) for doc_id, score in best]
+
+    def __len__(self):
+        return len(self.passages)
+
+
+def build_index(training_data: Dict, examples_path: str = TRAINING_EXAMPLES_FILE) -> BM25Index:
+    """Build the knowledge-base index from training data and Q&A examples"""
+    passages = passages_from_training_data(training_data)
+    passages.extend(passages_from_examples(examples_path, start_id=len(passages)))
+    return BM25Index(passages)
+
+
+class DenseIndex:
+    """Embedding search over a VectorStore, returning (score, Passage) pairs like BM25Index"""
+
+    def __init__(self, store, embedder, index=None):
+        self.store = store
+        self.embedder = embedder
+        self.index = index
+
+    def search(self, query: str, k: int = 3):
+        query_vector = self.embedder.encode_query(query)
+        if self.index is not None:
+            results = [(score, self.store.records[row]) for score, row in self.index.search(query_vector, k=k)]
+        else:
+            results = self.store.search(query_vector, k=k)
+        return [
+            (score, Passage(record["id"], record.get("source", "vectors"), record.get("text", ""), None))
+            for score, record in results
+        ]
+
+    def __len__(self):
+        return len(self.store)
+
+
+def load_dense_index(enabled: bool = DENSE_RETRIEVAL, embedder=None):
+    """DenseIndex over the on-disk vector store, or None when disabled or unavailable.
+
+    Pass the embedder of a previous DenseIndex to reuse its loaded model.
+    """
+    if not enabled:
+        return None
+    try:
+        from ann_index import load_ann_index
+        from embeddings import EMBEDDING_MODEL_NAME, EmbeddingService
+        from vector_store import VectorStore
+
+        store = VectorStore()
+        if not len(store):
+            print("Dense retrieval disabled: the vector store is empty")
+            return None
+        model_name = store.model or EMBEDDING_MODEL_NAME
+        if embedder is None or embedder.model_name != model_name:
+            embedder = EmbeddingService(model_name=model_name)
+        embedder.model  # load now rather than on the first request
+        return DenseIndex(store, embedder, load_ann_index(store))
+    except ImportError as e:
+        print(f"Dense retrieval disabled: {str(e)}")
+        return None
+
+
+def merge_results(*result_lists, k: int = 3):
+    """Interleave ranked result lists, dropping repeated passages, up to k results"""
+    merged, seen = [], set()
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank < len(results) and results[rank][1].text not in seen:
+                seen.add(results[rank][1].text)
+                merged.append(results[rank])
+    return merged[:k]
+
+
+if __name__ == "__main__":
+    with open(TRAINING_DATA_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    start = time.perf_counter()
+    index = build_index(data)
+    print(f"Indexed {len(index)} passages in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    query = " ".join(sys.argv[1:]) or "How long does shipping take?"
+    start = time.perf_counter()
+    results = index.search(query)
+    print(f"Query answered in {(time.perf_counter() - start) * 1000:.3f} ms\n")
+    for score, passage in results:
+        print(f"[{score:.2f}] ({passage.source}) {passage.text[:120]}")
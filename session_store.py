@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List
+
+from text_utils import estimate_tokens
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_TOKENS = int(os.getenv("SESSION_MAX_TOKENS", "3000"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Turns are stored as (role code, content) tuples instead of dicts
+ROLE_CODES = {"user": "u", "assistant": "a", "system": "s"}
+ROLE_NAMES = {code: role for role, code in ROLE_CODES.items()}
+
+
+def expand_turns(turns) -> List[Dict[str, str]]:
+    return [{"role": ROLE_NAMES[code], "content": content} for code, content in turns]
+
+
+def trim_turns(turns, max_tokens):
+    """Drop the oldest turns until the history fits the token budget; the latest turn is always kept"""
+    total = sum(estimate_tokens(content) for _, content in turns)
+    start = 0
+    while total > max_tokens and start < len(turns) - 1:
+        total -= estimate_tokens(turns[start][1])
+        start += 1
+    # Never open the history with an assistant reply
+    while start < len(turns) - 1 and turns[start][0] == "a":
+        start += 1
+    return turns[start:]
+
+
+class SessionStore(ABC):
+    """Conversation history per session id, bounded by idle TTL and a token budget"""
+
+    def __init__(self, ttl=SESSION_TTL, max_tokens=SESSION_MAX_TOKENS):
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        ...
+
+    @abstractmethod
+    def append(self, session_id: str, role: str, content: str):
+        ...
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        ...
+
+    def stats(self) -> Dict:
+        return {"backend": type(self).__name__}
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store; idle sessions are evicted oldest-first"""
+
+    def __init__(self, ttl=SESSION_TTL, max_tokens=SESSION_MAX_TOKENS, max_sessions=SESSION_MAX_SESSIONS):
+        super().__init__(ttl, max_tokens)
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _evict(self, now):
+        # Sessions are kept in last-seen order, so expired ones sit at the front
+        while self._sessions:
+            session_id, (last_seen, _) = next(iter(self._sessions.items()))
+            if now - last_seen < self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def get_history(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            return expand_turns(entry[1]) if entry else []
+
+    def append(self, session_id, role, content):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            turns = entry[1] if entry else ()
+            turns = trim_turns(turns + ((ROLE_CODES[role], content),), self.max_tokens)
+            self._sessions[session_id] = (now, turns)
+            self._evict(now)
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        return {"backend": "memory", "sessions": len(self._sessions), "evictions": self.evictions}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared by every worker on one host through a SQLite file"""
+
+    def __init__(self, path=SESSION_DB_PATH, ttl=SESSION_TTL, max_tokens=SESSION_MAX_TOKENS):
+        super().__init__(ttl, max_tokens)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " session_id TEXT NOT NULL, seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " role TEXT NOT NULL, content TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, seq)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS turns_created ON turns (created)")
+
+    def _turns(self, session_id):
+        rows = self._conn.execute(
+            "SELECT seq, role, content, created FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        if rows and time.time() - rows[-1][3] >= self.ttl:
+            self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            return []
+        return rows
+
+    def get_history(self, session_id):
+        with self._lock:
+            return expand_turns((role, content) for _, role, content, _ in self._turns(session_id))
+
+    def append(self, session_id, role, content):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._turns(session_id)
+                self._conn.execute(
+                    "INSERT INTO turns (session_id, role, content, created) VALUES (?, ?, ?, ?)",
+                    (session_id, ROLE_CODES[role], content, now),
+                )
+                turns = [(r, c) for _, r, c, _ in rows] + [(ROLE_CODES[role], content)]
+                dropped = len(turns) - len(trim_turns(turns, self.max_tokens))
+                if dropped:
+                    cutoff = rows[dropped - 1][0]
+                    self._conn.execute("DELETE FROM turns WHERE session_id = ? AND seq <= ?", (session_id, cutoff))
+                # Sweep sessions whose latest turn is older than the TTL
+                self._conn.execute(
+                    "DELETE FROM turns WHERE session_id IN ("
+                    " SELECT session_id FROM turns GROUP BY session_id HAVING MAX(created) < ?)",
+                    (now - self.ttl,),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+
+    def stats(self):
+        with self._lock:
+            sessions = self._conn.execute("SELECT COUNT(DISTINCT session_id) FROM turns").fetchone()[0]
+        return {"backend": "sqlite", "sessions": sessions}
+
+
+class RedisSessionStore(SessionStore):
+    """Store shared across hosts; each session is a Redis list that expires when idle"""
+
+    def __init__(self, client=None, url=REDIS_URL, ttl=SESSION_TTL, max_tokens=SESSION_MAX_TOKENS):
+        super().__init__(ttl, max_tokens)
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("SESSION_STORE=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self.redis = client
+
+    @staticmethod
+    def _key(session_id):
+        return f"souqcoom:session:{session_id}"
+
+    def _turns(self, session_id):
+        return [tuple(json.loads(item)) for item in self.redis.lrange(self._key(session_id), 0, -1)]
+
+    def get_history(self, session_id):
+        return expand_turns(self._turns(session_id))
+
+    def append(self, session_id, role, content):
+        key = self._key(session_id)
+        # Push and read back in one transaction, so a concurrent append is never overwritten
+        pipe = self.redis.pipeline()
+        pipe.rpush(key, json.dumps([ROLE_CODES[role], content], ensure_ascii=False))
+        pipe.pexpire(key, int(self.ttl * 1000))
+        pipe.lrange(key, 0, -1)
+        items = pipe.execute()[-1]
+        turns = [tuple(json.loads(item)) for item in items]
+        keep = len(trim_turns(turns, self.max_tokens))
+        if keep < len(turns):
+            # Count from the end: turns pushed since the read are newer and must survive the trim
+            self.redis.ltrim(key, -keep, -1)
+
+    def clear(self, session_id):
+        self.redis.delete(self._key(session_id))
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+def create_session_store(backend=SESSION_STORE) -> SessionStore:
+    """Build the store selected by SESSION_STORE (memory, sqlite or redis)"""
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "redis":
+        return RedisSessionStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_STORE: {backend}")
+    return MemorySessionStore()
@@ -0,0 +1,97 @@
+import asyncio
+
+import metrics
+
+
+class _Flight:
+    __slots__ = ("parts", "done", "error", "changed", "task")
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def notify(self):
+        # Waiters hold the old event; a fresh one is used for the next change
+        event, self.changed = self.changed, asyncio.Event()
+        event.set()
+
+
+class SingleFlight:
+    """Attach concurrent identical requests to one in-flight upstream call.
+
+    The first request for a key (the leader) runs produce(), an async generator
+    of text deltas, in its own task, so the call completes even if that client
+    disconnects. Requests for the same key that arrive while it is running
+    (followers) replay the deltas received so far and then follow the live
+    ones; JSON callers get the joined text. Once the call ends the key is
+    released, so later requests start afresh (or hit the response cache).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key, produce):
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.followers += 1
+            metrics.count_single_flight("follower")
+            return flight
+        flight = self._flights[key] = _Flight()
+        self.leaders += 1
+        metrics.count_single_flight("leader")
+        flight.task = asyncio.get_running_loop().create_task(self._run(key, flight, produce))
+        return flight
+
+    async def _run(self, key, flight, produce):
+        try:
+            async for part in produce():
+                flight.parts.append(part)
+                flight.notify()
+        except Exception as e:
+            flight.error = e
+        except BaseException:
+            flight.error = RuntimeError("Upstream call was cancelled")
+            raise
+        finally:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.notify()
+
+    async def stream(self, key, produce):
+        """Yield the deltas of the shared call for key, starting produce() if none is running"""
+        flight = self._join(key, produce)
+        sent = 0
+        while True:
+            changed = flight.changed
+            while sent < len(flight.parts):
+                yield flight.parts[sent]
+                sent += 1
+            if flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            await changed.wait()
+
+    async def collect(self, key, produce):
+        """Full text of the shared call for key"""
+        flight = self._join(key, produce)
+        while not flight.done:
+            await flight.changed.wait()
+        if flight.error is not None:
+            raise flight.error
+        return "".join(flight.parts)
+
+    def stats(self):
+        requests = self.leaders + self.followers
+        return {
+            "in_flight": len(self._flights),
+            "upstream_calls": self.leaders,
+            "coalesced_requests": self.followers,
+            "coalescing_ratio": round(self.followers / requests, 4) if requests else 0.0,
+        }
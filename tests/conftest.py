@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# The modules under test live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qa_pipeline  # noqa: E402
+
+
+@pytest.fixture
+def pair():
+    """pair(n) builds the Q&A pair the fake model replies use for n"""
+    return lambda n: {"question": f"Q{n}?", "answer": f"A{n}."}
+
+
+@pytest.fixture(autouse=True)
+def no_recording(monkeypatch):
+    # Tests never write model replies to QA_RECORD_RESPONSES
+    monkeypatch.setattr(qa_pipeline, "QA_RECORD_RESPONSES", "")
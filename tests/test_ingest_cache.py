@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import ingest_cache
+from ingest_cache import IngestManifest
+
+
+@pytest.fixture
+def document(monkeypatch, tmp_path):
+    """A fake PDF whose pages are given as text; records which pages get extracted"""
+    pdf_path = tmp_path / "doc.pdf"
+    pages, extracted = [], []
+
+    def set_pages(*texts):
+        pages[:] = texts
+        pdf_path.write_text("\n".join(texts), encoding="utf-8")
+
+    def iter_pages(path, page_indices, stats=None, **options):
+        for i in page_indices:
+            extracted.append(i)
+            yield i, pages[i]
+
+    monkeypatch.setattr(ingest_cache, "page_hashes", lambda path: [ingest_cache.chunk_key(f"{i}:{text}")
+                                                                   for i, text in enumerate(pages)])
+    monkeypatch.setattr(ingest_cache, "iter_pages", iter_pages)
+    set_pages("First page", "Second page é", "")
+    return str(pdf_path), set_pages, extracted
+
+
+def test_pages_are_cached_outside_the_manifest(tmp_path, document):
+    pdf_path, _, extracted = document
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    assert list(manifest.iter_text(pdf_path)) == ["First page", "Second page é", ""]
+    manifest.save()
+    assert extracted == [0, 1, 2]
+
+    saved = (tmp_path / "manifest.json").read_text(encoding="utf-8")
+    assert "First page" not in saved
+    reopened = IngestManifest(str(tmp_path / "manifest.json"))
+    assert list(reopened.iter_text(pdf_path)) == ["First page", "Second page é", ""]
+    assert extracted == [0, 1, 2]
+
+
+def test_only_changed_pages_are_extracted(tmp_path, document):
+    pdf_path, set_pages, extracted = document
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    list(manifest.iter_text(pdf_path))
+    set_pages("First page", "Second page, revised", "")
+    assert list(manifest.iter_text(pdf_path)) == ["First page", "Second page, revised", ""]
+    assert extracted == [0, 1, 2, 1]
+
+
+def test_lost_page_files_are_extracted_again(tmp_path, document):
+    pdf_path, _, extracted = document
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    list(manifest.iter_text(pdf_path))
+    for path in (tmp_path / "ingest_pages").iterdir():
+        path.write_bytes(path.read_bytes()[:len("First page")])
+    assert list(manifest.iter_text(pdf_path)) == ["First page", "Second page é", ""]
+    assert extracted == [0, 1, 2, 1]
+
+
+def test_old_manifest_page_text_is_moved_out(tmp_path, document):
+    pdf_path, _, extracted = document
+    hashes = ingest_cache.page_hashes(pdf_path)
+    old = {"files": {}, "pages": dict(zip(hashes, ["First page", "Second page é", ""])), "chunks": {}}
+    (tmp_path / "manifest.json").write_text(json.dumps(old), encoding="utf-8")
+
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    assert "First page" not in (tmp_path / "manifest.json").read_text(encoding="utf-8")
+    assert list(manifest.iter_text(pdf_path)) == ["First page", "Second page é", ""]
+    assert extracted == []
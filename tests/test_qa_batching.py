@@ -0,0 +1,69 @@
+import json
+
+from qa_pipeline import batch_chunks, generate_in_batches, parse_batch_pairs
+
+
+def test_batches_respect_size_and_token_budget():
+    chunks = ["word " * 10] * 5 + ["word " * 400] + ["word"]
+    batches = list(batch_chunks(chunks, batch_size=2, token_budget=100))
+    assert [len(batch) for batch in batches] == [2, 2, 1, 1, 1]
+    assert [chunk for batch in batches for chunk in batch] == chunks
+
+
+def test_batch_reply_keyed_by_id(pair):
+    content = json.dumps({"1": [pair(1)], "2": [pair(2), pair(3)]})
+    assert parse_batch_pairs(content, 2, endpoint="test") == [[pair(1)], [pair(2), pair(3)]]
+
+
+def test_batch_reply_with_id_fields(pair):
+    content = "\n".join(json.dumps(dict(pair(n), id=n)) for n in (2, 1))
+    assert parse_batch_pairs(content, 2, endpoint="test") == [[pair(1)], [pair(2)]]
+
+
+def test_missing_batch_id_is_none(pair):
+    content = json.dumps({"1": [pair(1)], "3": [pair(3)]})
+    assert parse_batch_pairs(content, 3, endpoint="test") == [[pair(1)], None, [pair(3)]]
+
+
+def test_unknown_batch_ids_are_ignored(pair):
+    content = json.dumps({"1": [pair(1)], "9": [pair(9)], "0": [pair(0)]})
+    assert parse_batch_pairs(content, 2, endpoint="test") == [[pair(1)], None]
+
+
+def test_duplicate_batch_id_pairs_go_to_the_same_chunk(pair):
+    content = json.dumps({"1": [pair(1)]}) + "\n" + json.dumps({"1": [pair(2)], "2": [pair(3)]})
+    assert parse_batch_pairs(content, 2, endpoint="test") == [[pair(1), pair(2)], [pair(3)]]
+
+
+def test_missing_chunks_are_retried_singly_in_order():
+    chunks = [f"chunk {i}" for i in range(10)]
+    retried = []
+
+    def generate_batch(batch):
+        # Drops every odd chunk, as a model skipping ids would
+        return [[{"question": chunk, "answer": "batched"}] if int(chunk.split()[1]) % 2 == 0 else None
+                for chunk in batch]
+
+    def generate(chunk):
+        retried.append(chunk)
+        return [{"question": chunk, "answer": "single"}]
+
+    results = generate_in_batches(chunks, generate_batch, generate, batch_size=4, max_workers=2)
+    assert [result[0]["question"] for result in results] == chunks
+    assert sorted(retried) == [f"chunk {i}" for i in range(1, 10, 2)]
+    assert all(result[0]["answer"] == ("single" if i % 2 else "batched") for i, result in enumerate(results))
+
+
+def test_failed_batch_request_retries_every_chunk(pair):
+    def generate_batch(batch):
+        raise RuntimeError("upstream error")
+
+    results = generate_in_batches(["a", "b", "c"], generate_batch, lambda chunk: [pair(chunk)],
+                                  batch_size=3, max_workers=1)
+    assert results == [[pair("a")], [pair("b")], [pair("c")]]
+
+
+def test_short_batch_reply_is_padded_and_retried(pair):
+    results = generate_in_batches(["a", "b", "c"], lambda batch: [[pair("a")]], lambda chunk: [pair(chunk + "!")],
+                                  batch_size=3, max_workers=1)
+    assert results == [[pair("a")], [pair("b!")], [pair("c!")]]
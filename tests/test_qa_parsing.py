@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from json_extract import JSONObjectExtractor, extract_objects
+from qa_pipeline import parse_batch_pairs, parse_qa_pairs
+
+
+def test_objects_in_prose_fences_and_arrays(pair):
+    text = 'Sure!\n```json\n[{"question": "Q1?", "answer": "A1."},\n {"question": "Q2?",\n  "answer": "A2."}]\n```\nDone.'
+    assert extract_objects(text) == [pair(1), pair(2)]
+
+
+def test_braces_and_escaped_quotes_inside_strings():
+    value = {"question": 'What does "{x}" mean?', "answer": "A \\\" and a }."}
+    assert extract_objects("noise " + json.dumps(value) + " noise") == [value]
+
+
+def test_trailing_commas_are_repaired(pair):
+    extractor = JSONObjectExtractor()
+    assert extractor.extract('{"question": "Q1?", "answer": "A1.",}') == [pair(1)]
+    assert extractor.malformed == 0
+
+
+def test_malformed_outer_object_keeps_nested_objects(pair):
+    extractor = JSONObjectExtractor()
+    text = '{"1": [{"question": "Q1?", "answer": "A1."}, oops], "2": [{"question": "Q2?", "answer": "A2."}]}'
+    assert extractor.extract(text) == [pair(1), pair(2)]
+    assert extractor.malformed == 1
+
+
+def test_truncated_reply_recovers_complete_objects(pair):
+    extractor = JSONObjectExtractor()
+    text = '{"1": [{"question": "Q1?", "answer": "A1."}, {"question": "Q2?", "answ'
+    assert extractor.extract(text) == [pair(1)]
+    assert extractor.malformed == 1
+
+
+def test_unparseable_text_yields_nothing():
+    assert extract_objects("") == []
+    assert extract_objects(None) == []
+    assert extract_objects("{not json at all}") == []
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_feeding_in_pieces_matches_whole_text(size):
+    text = ('```json\n{"question": "Q\\"{1}?", "answer": "A1."}\n'
+            '{"question": "Q2?", "answer": "A\\\\2."}\n```')
+    extractor = JSONObjectExtractor()
+    streamed = [value for i in range(0, len(text), size) for value in extractor.feed(text[i:i + size])]
+    streamed += extractor.close()
+    assert streamed == extract_objects(text)
+    assert len(streamed) == 2
+
+
+def test_single_chunk_reply_as_json_lines(pair):
+    content = '{"question": "Q1?", "answer": "A1."}\n{"question": "Q2?", "answer": "A2."}\n{"note": "x"}'
+    assert parse_qa_pairs(content, endpoint="test") == [pair(1), pair(2)]
+
+
+def test_truncated_batch_reply_keeps_finished_chunks(pair):
+    content = '{"1": [{"question": "Q1?", "answer": "A1."}], "2": [{"question": "Q2?", "answer": "A2."}], "3": [{"quest'
+    assert parse_batch_pairs(content, 3, endpoint="test") == [[pair(1)], [pair(2)], None]
+
+
+def test_empty_or_garbage_batch_reply():
+    assert parse_batch_pairs("", 2, endpoint="test") == [None, None]
+    assert parse_batch_pairs("I cannot help with that.", 2, endpoint="test") == [None, None]
@@ -0,0 +1,72 @@
+import json
+
+from retrieval import BM25Index, Passage, build_index, merge_results
+
+TRAINING_DATA = {
+    "company_info": {"name": "Souqcoom", "description": "An online marketplace.", "values": ["Trust", "Speed"]},
+    "common_responses": {"greeting": {"en": "Hello, how can I help?", "ar": "مرحبا، كيف يمكنني المساعدة؟"}},
+    "faqs": {
+        "shipping": {
+            "question": {"en": "How long does shipping take?"},
+            "answer": {"en": "Orders arrive within 3 to 5 business days."},
+        },
+        "returns": {
+            "question": {"en": "Can I return an item?"},
+            "answer": {"en": "Items can be returned within 14 days of delivery."},
+        },
+    },
+    "product_categories": ["Electronics", "Fashion"],
+}
+
+
+def passages(*texts):
+    return [Passage(i, "test", text, "en") for i, text in enumerate(texts)]
+
+
+def test_best_match_ranks_first():
+    index = BM25Index(passages("refund policy for orders", "shipping takes five days", "contact the seller"))
+    results = index.search("how long does shipping take", k=3)
+    assert results[0][1].text == "shipping takes five days"
+    assert [score for score, _ in results] == sorted((score for score, _ in results), reverse=True)
+
+
+def test_rare_terms_outweigh_common_ones():
+    index = BM25Index(passages("order order warranty", "order status", "order history", "order tracking"))
+    assert index.search("order warranty", k=1)[0][1].text == "order order warranty"
+
+
+def test_no_match_and_empty_index():
+    index = BM25Index(passages("refund policy"))
+    assert index.search("zebra", k=3) == []
+    assert index.search("", k=3) == []
+    assert BM25Index([]).search("refund", k=3) == []
+
+
+def test_k_limits_results():
+    index = BM25Index(passages(*[f"refund case {i}" for i in range(10)]))
+    assert len(index.search("refund", k=3)) == 3
+
+
+def test_index_covers_training_data_and_examples(tmp_path):
+    examples = tmp_path / "training_examples.jsonl"
+    example = {"messages": [
+        {"role": "user", "content": "Do you sell gift cards?"},
+        {"role": "assistant", "content": "Yes, gift cards are sold in every category."},
+    ]}
+    examples.write_text(json.dumps(example) + "\nnot json\n", encoding="utf-8")
+
+    index = build_index(TRAINING_DATA, examples_path=str(examples))
+    assert index.search("return an item", k=1)[0][1].source == "faqs.returns"
+    assert index.search("gift cards", k=1)[0][1].source == "training_examples"
+    assert len({passage.id for passage in index.passages}) == len(index)
+
+
+def test_missing_examples_file(tmp_path):
+    index = build_index(TRAINING_DATA, examples_path=str(tmp_path / "missing.jsonl"))
+    assert all(passage.source != "training_examples" for passage in index.passages)
+
+
+def test_merge_interleaves_and_drops_duplicates():
+    a, b, c = passages("one", "two", "three")
+    merged = merge_results([(2.0, a), (1.0, b)], [(0.9, b), (0.5, c)], k=3)
+    assert [passage.text for _, passage in merged] == ["one", "two", "three"]
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+from session_store import (
+    MemorySessionStore, RedisSessionStore, SessionStore, SQLiteSessionStore, create_session_store, trim_turns,
+)
+
+
+class FakeRedis:
+    """In-memory stand-in for the list, expiry and pipeline commands RedisSessionStore uses"""
+
+    def __init__(self):
+        self.lists = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        if key in self.expires and time.monotonic() >= self.expires[key]:
+            self.lists.pop(key, None)
+            self.expires.pop(key, None)
+        return self.lists.get(key, [])
+
+    def rpush(self, key, value):
+        with self.lock:
+            self._live(key)
+            self.lists.setdefault(key, []).append(value.encode("utf-8"))
+            return len(self.lists[key])
+
+    def pexpire(self, key, milliseconds):
+        with self.lock:
+            self.expires[key] = time.monotonic() + milliseconds / 1000
+
+    def lrange(self, key, start, end):
+        with self.lock:
+            items = self._live(key)
+            return list(items[start:None if end == -1 else end + 1])
+
+    def ltrim(self, key, start, end):
+        with self.lock:
+            items = self._live(key)
+            self.lists[key] = items[start:None if end == -1 else end + 1]
+
+    def delete(self, key):
+        with self.lock:
+            self.lists.pop(key, None)
+            self.expires.pop(key, None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands and runs them together, like a MULTI/EXEC transaction"""
+
+    transaction_lock = threading.Lock()
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((getattr(self.redis, name), args))
+
+    def execute(self):
+        with self.transaction_lock:
+            return [command(*args) for command, args in self.commands]
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_store(request, tmp_path):
+    def make(**options):
+        if request.param == "memory":
+            return MemorySessionStore(**options)
+        if request.param == "sqlite":
+            return SQLiteSessionStore(path=str(tmp_path / "sessions.db"), **options)
+        return RedisSessionStore(client=FakeRedis(), **options)
+    return make
+
+
+def test_history_round_trip(make_store):
+    store = make_store()
+    store.append("s1", "user", "Where is my order?")
+    store.append("s1", "assistant", "It ships tomorrow.")
+    store.append("s2", "user", "مرحبا")
+    assert store.get_history("s1") == [
+        {"role": "user", "content": "Where is my order?"},
+        {"role": "assistant", "content": "It ships tomorrow."},
+    ]
+    assert store.get_history("s2") == [{"role": "user", "content": "مرحبا"}]
+    store.clear("s1")
+    assert store.get_history("s1") == []
+    assert store.get_history("unknown") == []
+
+
+def test_idle_sessions_expire(make_store):
+    store = make_store(ttl=0.05)
+    store.append("s1", "user", "Hello")
+    assert store.get_history("s1")
+    time.sleep(0.1)
+    assert store.get_history("s1") == []
+    store.append("s1", "user", "Hello again")
+    assert store.get_history("s1") == [{"role": "user", "content": "Hello again"}]
+
+
+def test_history_is_trimmed_to_the_token_budget(make_store):
+    # Each turn is 40 characters, 11 tokens; a 30-token budget keeps two turns
+    store = make_store(max_tokens=30)
+    for i in range(6):
+        store.append("s1", "user" if i % 2 == 0 else "assistant", f"{i}" * 40)
+    assert [turn["content"][0] for turn in store.get_history("s1")] == ["4", "5"]
+
+
+def test_concurrent_appends_are_not_lost(make_store):
+    store = make_store(max_tokens=10 ** 6)
+    threads = [
+        threading.Thread(target=lambda n=n: [store.append("s1", "user", f"{n}-{i}") for i in range(20)])
+        for n in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.get_history("s1")) == 80
+
+
+def test_trim_turns_drops_oldest_and_keeps_the_latest():
+    turns = [("u", "a" * 40), ("a", "b" * 40), ("u", "c" * 40)]
+    assert trim_turns(turns, 1000) == turns
+    assert trim_turns(turns, 25) == turns[2:]
+    # The latest turn stays even when it alone is over the budget
+    assert trim_turns([("u", "x" * 400)], 10) == [("u", "x" * 400)]
+
+
+def test_trim_turns_never_starts_with_an_assistant_reply():
+    turns = [("u", "a" * 40), ("a", "b" * 40), ("a", "c" * 40), ("u", "d" * 40)]
+    assert trim_turns(turns, 35) == turns[3:]
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_session_store("memcached")
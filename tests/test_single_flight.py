@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def producer(parts, calls, gate=None, error=None):
+    async def produce():
+        calls.append(1)
+        for part in parts:
+            if gate is not None:
+                await gate.wait()
+            yield part
+        if error is not None:
+            raise error
+    return produce
+
+
+def test_concurrent_identical_requests_share_one_call():
+    async def run():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        produce = producer(["Hello", ", ", "world"], calls, gate)
+        tasks = [asyncio.ensure_future(flights.collect("key", produce)) for _ in range(5)]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*tasks), calls, flights.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == ["Hello, world"] * 5
+    assert len(calls) == 1
+    assert stats["upstream_calls"] == 1 and stats["coalesced_requests"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_different_keys_do_not_coalesce():
+    async def run():
+        flights, calls = SingleFlight(), []
+        return await asyncio.gather(
+            flights.collect("a", producer(["A"], calls)),
+            flights.collect("b", producer(["B"], calls)),
+        ), calls
+
+    results, calls = asyncio.run(run())
+    assert results == ["A", "B"]
+    assert len(calls) == 2
+
+
+def test_late_stream_replays_deltas_sent_so_far():
+    async def run():
+        flights, calls = SingleFlight(), []
+        step = asyncio.Queue()
+
+        async def produce():
+            calls.append(1)
+            for part in ["one ", "two ", "three"]:
+                await step.get()
+                yield part
+
+        early = []
+
+        async def follow(into):
+            async for delta in flights.stream("key", produce):
+                into.append(delta)
+
+        first = asyncio.ensure_future(follow(early))
+        await step.put(None)
+        await step.put(None)
+        while len(early) < 2:
+            await asyncio.sleep(0)
+        late = []
+        second = asyncio.ensure_future(follow(late))
+        await asyncio.sleep(0)
+        await step.put(None)
+        await asyncio.gather(first, second)
+        return early, late, calls
+
+    early, late, calls = asyncio.run(run())
+    assert early == late == ["one ", "two ", "three"]
+    assert len(calls) == 1
+
+
+def test_errors_reach_every_waiter_and_release_the_key():
+    async def run():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        produce = producer(["partial"], calls, gate, error=RuntimeError("upstream failed"))
+        tasks = [asyncio.ensure_future(flights.collect("key", produce)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # The key is free again, so the next request starts a new call
+        retry = await flights.collect("key", producer(["ok"], calls))
+        return results, retry, calls
+
+    results, retry, calls = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retry == "ok"
+    assert len(calls) == 2
+
+
+def test_leader_disconnect_does_not_cancel_the_shared_call():
+    async def run():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        produce = producer(["done"], calls, gate)
+        leader = asyncio.ensure_future(flights.collect("key", produce))
+        follower = asyncio.ensure_future(flights.collect("key", produce))
+        await asyncio.sleep(0)
+        leader.cancel()
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower, calls
+
+    result, calls = asyncio.run(run())
+    assert result == "done"
+    assert len(calls) == 1
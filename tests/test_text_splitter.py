@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from text_splitter import STREAM_WINDOW, RecursiveTextSplitter, split_pages
+
+
+def random_pages(seed, count=40):
+    rng = random.Random(seed)
+    words = ["order", "refund", "شحن", "seller", "delivery", "warranty", "invoice", "é"]
+    # Random letters keep runs from repeating, so every chunk has one place in the text
+    letters = lambda n: "".join(rng.choice("abcdefghij") for _ in range(n))
+    pages = []
+    for _ in range(count):
+        if rng.random() < 0.1:
+            pages.append("")
+            continue
+        paragraphs = []
+        for _ in range(rng.randint(1, 6)):
+            lines = [
+                " ".join(rng.choice(words) if rng.random() < 0.9 else letters(rng.randint(5, 150))
+                         for _ in range(rng.randint(1, 60)))
+                for _ in range(rng.randint(1, 4))
+            ]
+            paragraphs.append("\n".join(lines))
+        if rng.random() < 0.1:
+            # A run with no separators at all, split character by character
+            paragraphs.append(letters(rng.randint(300, 900)))
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+
+def assert_covers(text, chunks):
+    """Chunks, in order, cover every non-whitespace character of text.
+
+    Each chunk must start no later than the first character not covered yet
+    (overlap or whitespace in between is fine); the latest such position is
+    taken, since repeated text can match earlier too.
+    """
+    start, end = 0, 0
+    for chunk in chunks:
+        limit = end
+        while limit < len(text) and text[limit].isspace():
+            limit += 1
+        position = text.rfind(chunk, start, limit + len(chunk))
+        assert position != -1, f"gap before chunk {chunk[:40]!r} at {end}"
+        start, end = position + 1, max(end, position + len(chunk))
+    assert not text[end:].strip(), f"text after the last chunk: {text[end:end + 40]!r}"
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(1000, 200), (120, 30), (50, 0)])
+def test_split_pages_loses_no_text_and_respects_the_size(seed, chunk_size, chunk_overlap):
+    pages = random_pages(seed)
+    text = "\n".join(page for page in pages if page)
+    chunks = list(split_pages(iter(pages), chunk_size, chunk_overlap))
+
+    assert chunks
+    assert max(len(chunk) for chunk in chunks) <= chunk_size
+    # Chunks are stripped, so only whitespace may be left out
+    assert_covers(text, chunks)
+
+
+def test_split_pages_matches_split_text_within_one_window():
+    splitter = RecursiveTextSplitter(300, 60)
+    pages = [page[:500] for page in random_pages(3, count=6) if page][:4]
+    text = "\n".join(pages)
+    assert len(text) < 300 * STREAM_WINDOW
+    assert list(splitter.split_pages(pages)) == splitter.split_text(text)
+
+
+def test_split_pages_is_lazy():
+    consumed = []
+
+    def pages():
+        for i, page in enumerate(random_pages(5, count=200)):
+            consumed.append(i)
+            yield page
+
+    chunks = split_pages(pages(), 100, 20)
+    next(chunks)
+    assert len(consumed) < 200
+
+
+def test_empty_input():
+    assert list(split_pages([])) == []
+    assert list(split_pages(["", ""])) == []
+
+
+def test_overlap_must_be_smaller_than_size():
+    with pytest.raises(ValueError):
+        RecursiveTextSplitter(100, 100)
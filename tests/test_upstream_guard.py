@@ -0,0 +1,189 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import metrics
+import mistral_client
+from upstream_guard import AdaptiveLimiter, CircuitBreaker
+
+
+def open_breaker(reset_timeout=0.05):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert 0 < breaker.retry_after() <= 60
+    assert breaker.times_opened == 1
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.times_opened == 2
+
+
+def test_throttled_probe_closes():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_throttled()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_throttling_while_closed_leaves_the_breaker_alone():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_throttled()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_released_probe_lets_the_next_call_probe():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_unreported_probe_expires_after_reset_timeout():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def client_with_open_breaker():
+    client = mistral_client.AsyncMistralClient(api_key="test")
+    client.breaker = open_breaker()
+    time.sleep(0.06)
+    return client
+
+
+@pytest.mark.parametrize("status, state", [
+    (200, CircuitBreaker.CLOSED),
+    (429, CircuitBreaker.CLOSED),
+    (503, CircuitBreaker.OPEN),
+])
+def test_probe_outcome_settles_the_breaker(status, state):
+    async def probe():
+        client = client_with_open_breaker()
+        async with client._upstream_slot("test", time.monotonic() + 5) as slot:
+            slot["status"] = status
+        await client.aclose()
+        return client.breaker
+
+    breaker = asyncio.run(probe())
+    assert breaker.state == state
+    assert breaker.probe_started is None
+
+
+@pytest.mark.parametrize("error", [ValueError("bad payload"), asyncio.CancelledError()])
+def test_probe_without_a_verdict_is_released(error):
+    async def probe():
+        client = client_with_open_breaker()
+        with pytest.raises(type(error)):
+            async with client._upstream_slot("test", time.monotonic() + 5):
+                raise error
+        await client.aclose()
+        return client.breaker
+
+    breaker = asyncio.run(probe())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_probe_transport_error_reopens():
+    async def probe():
+        client = client_with_open_breaker()
+        with pytest.raises(httpx.ConnectError):
+            async with client._upstream_slot("test", time.monotonic() + 5):
+                raise httpx.ConnectError("refused")
+        await client.aclose()
+        return client.breaker
+
+    assert asyncio.run(probe()).state == CircuitBreaker.OPEN
+
+
+def test_limiter_halves_on_congestion_and_grows_back():
+    async def run():
+        limiter = AdaptiveLimiter(8, min_limit=1, latency_target=1.0)
+        await limiter.acquire()
+        limiter.release(congested=True)
+        assert limiter.limit == 4
+        # One burst of congestion halves the limit once
+        await limiter.acquire()
+        limiter.release(congested=True)
+        assert limiter.limit == 4
+        for _ in range(20):
+            await limiter.acquire()
+            limiter.release(latency=0.01)
+        assert 4 < limiter.limit <= 8
+        assert limiter.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_limiter_queues_beyond_the_limit():
+    async def run():
+        limiter = AdaptiveLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done() and limiter.stats()["waiting"] == 1
+        limiter.release(latency=0.01)
+        await waiter
+        assert limiter.in_flight == 1
+
+    asyncio.run(run())
+
+
+def test_every_429_is_counted_as_rate_limited():
+    async def throttled():
+        client = mistral_client.AsyncMistralClient(api_key="test")
+        async with client._upstream_slot("test", time.monotonic() + 5) as slot:
+            slot["status"] = 429
+        await client.aclose()
+
+    before = sum(metrics.RATE_LIMITED.values.values())
+    asyncio.run(throttled())
+    assert sum(metrics.RATE_LIMITED.values.values()) == before + 1
@@ -0,0 +1,124 @@
+import os
+import re
+
+# Chunk size and overlap in characters for Q&A generation and embeddings.
+# Changing them changes every chunk hash, so cached Q&A pairs are regenerated.
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+# Buffered text (in chunk sizes) split at a time when streaming pages
+STREAM_WINDOW = 8
+
+SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+class RecursiveTextSplitter:
+    """Split text on paragraphs, then lines, then words, then characters.
+
+    Produces the same chunks as langchain's RecursiveCharacterTextSplitter with
+    the same size and overlap, so chunk hashes cached in the ingest manifest
+    stay valid. split_pages streams chunks from an iterable of page texts
+    while holding only a few chunks' worth of text.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separators=SEPARATORS):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(separators)
+
+    def split_text(self, text):
+        return self._split(text, self.separators)
+
+    def _split(self, text, separators):
+        separator, rest = separators[-1], []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if candidate in text:
+                separator, rest = candidate, separators[i + 1:]
+                break
+
+        chunks, good = [], []
+        for piece in _split_keeping_separator(text, separator):
+            if len(piece) < self.chunk_size:
+                good.append(piece)
+                continue
+            if good:
+                chunks.extend(self._merge(good))
+                good = []
+            if rest:
+                chunks.extend(self._split(piece, rest))
+            else:
+                chunks.append(piece)
+        if good:
+            chunks.extend(self._merge(good))
+        return chunks
+
+    def _merge(self, pieces):
+        """Pack consecutive pieces into chunks, carrying up to chunk_overlap characters over"""
+        chunks, current, total = [], [], 0
+        for piece in pieces:
+            if total + len(piece) > self.chunk_size and current:
+                chunk = "".join(current).strip()
+                if chunk:
+                    chunks.append(chunk)
+                while total > self.chunk_overlap or (total + len(piece) > self.chunk_size and total > 0):
+                    total -= len(current.pop(0))
+            current.append(piece)
+            total += len(piece)
+        chunk = "".join(current).strip()
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def split_pages(self, pages):
+        """Yield chunks of the pages joined by newlines, as soon as they are complete.
+
+        Text is buffered until it spans STREAM_WINDOW chunk sizes, then split;
+        chunks that end at least one chunk size before the end of the buffer
+        are yielded and the buffer restarts at the first chunk not yielded.
+        Empty pages are skipped.
+        """
+        window = self.chunk_size * STREAM_WINDOW
+        parts, length = [], 0
+        for page in pages:
+            if not page:
+                continue
+            if parts:
+                parts.append("\n")
+                length += 1
+            parts.append(page)
+            length += len(page)
+            if length < window:
+                continue
+
+            text = "".join(parts)
+            keep_from = None
+            search_from = 0
+            for chunk in self.split_text(text):
+                start = text.find(chunk, search_from)
+                search_from = start + 1
+                if start + len(chunk) > len(text) - self.chunk_size:
+                    keep_from = start
+                    break
+                yield chunk
+            rest = text[keep_from:] if keep_from is not None else ""
+            parts, length = ([rest], len(rest)) if rest else ([], 0)
+
+        if parts:
+            yield from self.split_text("".join(parts))
+
+
+def _split_keeping_separator(text, separator):
+    """Split text on separator, which stays at the start of the piece that follows it"""
+    if not separator:
+        return list(text)
+    pieces = re.split(f"({re.escape(separator)})", text)
+    merged = [pieces[0]] + [pieces[i] + pieces[i + 1] for i in range(1, len(pieces), 2)]
+    return [piece for piece in merged if piece]
+
+
+def split_pages(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    return RecursiveTextSplitter(chunk_size, chunk_overlap).split_pages(pages)
@@ -0,0 +1,38 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict
+
+# Arabic harakat, superscript alef and tatweel carry no meaning for matching
+ARABIC_MARKS = re.compile("[\u064B-\u065F\u0670\u0640]")
+ARABIC_LETTER_VARIANTS = str.maketrans({
+    "\u0623": "\u0627",  # alef with hamza above
+    "\u0625": "\u0627",  # alef with hamza below
+    "\u0622": "\u0627",  # alef with madda
+    "\u0671": "\u0627",  # alef wasla
+    "\u0649": "\u064A",  # alef maksura -> yeh
+    "\u0629": "\u0647",  # teh marbuta -> heh
+})
+PUNCTUATION = re.compile(r"[^\w\s]")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Case-, diacritic-, punctuation- and whitespace-insensitive form of a question"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = ARABIC_MARKS.sub("", text).translate(ARABIC_LETTER_VARIANTS)
+    text = PUNCTUATION.sub(" ", text)
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def char_ngrams(text: str, n: int = 3) -> Dict[str, int]:
+    """Character n-gram counts of an already normalized string, with word boundaries"""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return Counter([padded])
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) used for prompt and history budgets"""
+    return len(text) // 4 + 1
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+# Consecutive failed attempts (5xx, timeouts, network errors) that open the breaker
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("MISTRAL_BREAKER_FAILURES", "5"))
+# Seconds the breaker stays open before a half-open probe is let through
+BREAKER_RESET_TIMEOUT = float(os.getenv("MISTRAL_BREAKER_RESET", "30"))
+
+# Concurrency floor for AIMD, and the latency above which a call counts as congestion
+MIN_CONCURRENCY = int(os.getenv("MISTRAL_MIN_CONCURRENCY", "1"))
+LATENCY_TARGET = float(os.getenv("MISTRAL_LATENCY_TARGET", "5"))
+# Multiplicative decrease applied to the limit on congestion
+AIMD_BACKOFF = 0.5
+# One burst of 429s should halve the limit once, not once per request
+DECREASE_INTERVAL = 1.0
+
+# Cap on a single jittered backoff sleep
+RETRY_MAX_DELAY = float(os.getenv("MISTRAL_RETRY_MAX_DELAY", "8"))
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe after a cooldown.
+
+    While open, calls are rejected immediately instead of queueing behind an
+    upstream that is down. A successful or throttled probe closes the breaker
+    again; a failed one reopens it for another reset_timeout. A probe that
+    ends without a verdict (e.g. cancelled) is released, so the next call
+    probes instead.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT,
+                 on_open=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_open = on_open
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.times_opened = 0
+
+    def allow(self):
+        """Whether a call may go upstream now; in half-open, only one probe at a time"""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_started = None
+        if self.state == self.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) does not block forever
+            if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+                return False
+            self.probe_started = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.probe_started = None
+        if self.state != self.CLOSED:
+            print("Mistral circuit closed")
+            self.state = self.CLOSED
+
+    def record_throttled(self):
+        """A 429: the upstream answered, so a probe closes the breaker; failures are not reset"""
+        if self.state == self.HALF_OPEN:
+            self.record_success()
+
+    def release_probe(self):
+        """Let the next call probe when the current probe settled without success or failure"""
+        if self.state == self.HALF_OPEN:
+            self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.probe_started = None
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            print(f"Mistral circuit open for {self.reset_timeout:.0f}s after {self.failures} failures")
+            if self.on_open is not None:
+                self.on_open()
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed (0 when not open)"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "retry_after": round(self.retry_after(), 1),
+        }
+
+
+class AdaptiveLimiter:
+    """Async concurrency limit adjusted by AIMD.
+
+    Each fast success raises the limit by 1/limit (about +1 per limit's worth
+    of calls); a 429, timeout, 5xx or call slower than latency_target
+    multiplies it by AIMD_BACKOFF. Waiters are served in FIFO order.
+    """
+
+    def __init__(self, max_limit, min_limit=MIN_CONCURRENCY, latency_target=LATENCY_TARGET):
+        self.max_limit = max_limit
+        self.min_limit = max(1, min(min_limit, max_limit))
+        self.latency_target = latency_target
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+
+    def _has_slot(self):
+        return self.in_flight < int(self.limit)
+
+    def try_acquire(self):
+        """Take a slot without waiting; False if the caller must queue"""
+        if self._has_slot() and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    async def acquire(self):
+        if self.try_acquire():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we were cancelled; hand it on
+                self.in_flight -= 1
+                self._wake()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, latency=None, congested=False):
+        """Give the slot back; latency of a successful call or congested=True adjusts the limit"""
+        self.in_flight -= 1
+        if congested or (latency is not None and latency > self.latency_target):
+            now = time.monotonic()
+            if now - self._last_decrease >= DECREASE_INTERVAL:
+                self.limit = max(self.min_limit, self.limit * AIMD_BACKOFF)
+                self._last_decrease = now
+                self.decreases += 1
+        elif latency is not None:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self):
+        return {
+            "limit": round(self.limit, 1),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "decreases": self.decreases,
+        }
+
+
+def backoff_delay(attempt, base, max_delay=RETRY_MAX_DELAY):
+    """Full-jitter exponential backoff, so retries from many workers do not arrive together"""
+    return random.uniform(0, min(max_delay, base * (2 ** attempt)))
+
+
+def parse_retry_after(value, default):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
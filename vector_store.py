@@ -0,0 +1,149 @@
+import json
+import os
+
+import numpy as np
+
+from file_utils import atomic_write_text
+
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "training_data/vectors")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+
+# float16 rows are scored in blocks of this many rows, converted to float32
+SEARCH_BLOCK_ROWS = 4096
+
+
+class VectorStore:
+    """Append-only matrix of normalized embeddings on disk, with an ID sidecar.
+
+    <path>.bin holds the raw row-major float32/float16 matrix, line i of
+    <path>.ids.jsonl describes row i, and <path>.json records the dimension,
+    dtype and model. Readers memory-map the matrix, so loading copies nothing.
+    """
+
+    def __init__(self, path=VECTOR_STORE_PATH, dim=None, dtype=VECTOR_DTYPE, model=None):
+        self.path = path
+        self.meta_path = path + ".json"
+        self.matrix_path = path + ".bin"
+        self.ids_path = path + ".ids.jsonl"
+
+        meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if dim is not None and dim != meta["dim"]:
+                raise ValueError(f"Vector store {path} has dimension {meta['dim']}, not {dim}")
+            if model is not None and meta.get("model") not in (None, model):
+                raise ValueError(f"Vector store {path} was built with {meta['model']}, not {model}")
+        self.dim = meta.get("dim", dim)
+        self.dtype = np.dtype(meta.get("dtype", dtype))
+        self.model = meta.get("model", model)
+
+        self.records = []
+        torn = False
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # A line without its newline is a partial write from an interrupted append
+                    if not line.endswith("\n"):
+                        torn = True
+                        break
+                    self.records.append(json.loads(line))
+        self._repair(torn)
+        self.rows = {record["id"]: row for row, record in enumerate(self.records)}
+        self._matrix = None
+
+    @property
+    def row_bytes(self):
+        return self.dim * self.dtype.itemsize
+
+    def _repair(self, torn=False):
+        """Drop a half-written tail left by an interrupted append"""
+        if self.dim is None:
+            self.records = []
+            return
+        stored = os.path.getsize(self.matrix_path) // self.row_bytes if os.path.exists(self.matrix_path) else 0
+        count = min(stored, len(self.records))
+        if os.path.exists(self.matrix_path) and os.path.getsize(self.matrix_path) != count * self.row_bytes:
+            with open(self.matrix_path, 'r+b') as f:
+                f.truncate(count * self.row_bytes)
+        if torn or len(self.records) != count:
+            self.records = self.records[:count]
+            atomic_write_text(self.ids_path, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self.records))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, item_id):
+        return item_id in self.rows
+
+    @property
+    def matrix(self):
+        """The (rows, dim) matrix, memory-mapped read-only"""
+        if self._matrix is None:
+            if not self.records:
+                return np.empty((0, self.dim or 0), dtype=self.dtype)
+            self._matrix = np.memmap(self.matrix_path, dtype=self.dtype, mode='r', shape=(len(self.records), self.dim))
+        return self._matrix
+
+    def append(self, ids, vectors, metadata=None):
+        """Append rows for new IDs. Vectors are stored as given, so normalize them first.
+
+        metadata is an optional list of dicts stored alongside each ID (e.g. text, source).
+        Returns the number of rows added; IDs already in the store are skipped.
+        """
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one vector per ID")
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+        if not os.path.exists(self.meta_path):
+            atomic_write_text(
+                self.meta_path, json.dumps({"dim": self.dim, "dtype": self.dtype.name, "model": self.model})
+            )
+
+        keep, new_records, seen = [], [], set()
+        for i, item_id in enumerate(ids):
+            if item_id in self.rows or item_id in seen:
+                continue
+            seen.add(item_id)
+            new_records.append(dict(metadata[i] if metadata else {}, id=item_id))
+            keep.append(i)
+        if not keep:
+            return 0
+
+        # Rows first, then IDs: a crash in between leaves rows that _repair drops
+        with open(self.matrix_path, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors[keep], dtype=self.dtype).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.ids_path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in new_records))
+        for record in new_records:
+            self.rows[record["id"]] = len(self.records)
+            self.records.append(record)
+        self._matrix = None
+        return len(keep)
+
+    def scores(self, query_vector):
+        """Dot product of query_vector with every row (cosine similarity for normalized vectors)"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        matrix = self.matrix
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        out = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SEARCH_BLOCK_ROWS):
+            block = matrix[start:start + SEARCH_BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ query
+        return out
+
+    def search(self, query_vector, k=3):
+        """Return up to k (score, record) pairs, best first"""
+        if not self.records:
+            return []
+        scores = self.scores(query_vector)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[row]), self.records[row]) for row in top]
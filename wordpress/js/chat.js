@@ -92,23 +92,18 @@
             this.scrollToBottom();
 
             try {
-                const response = await $.ajax({
-                    url: souqcoom_ajax.ajax_url,
-                    type: 'POST',
-                    data: {
-                        action: 'souqcoom_chat_message',
-                        message: userMessage,
-                        nonce: souqcoom_ajax.nonce
+                if (this.canStream()) {
+                    try {
+                        await this.streamReply(userMessage, loadingMessage);
+                    } catch (streamError) {
+                        // Network drop, proxy timeout or upstream error: ask again through the AJAX proxy
+                        console.warn('Souqcoom Chat stream failed, retrying without streaming:', streamError);
+                        this.chatbox.append(loadingMessage);
+                        this.scrollToBottom();
+                        await this.ajaxReply(userMessage, loadingMessage);
                     }
-                });
-
-                // Remove loading animation
-                loadingMessage.remove();
-
-                if (response.success) {
-                    this.chatbox.append(this.createChatMessage(response.data, 'incoming'));
                 } else {
-                    throw new Error(response.data);
+                    await this.ajaxReply(userMessage, loadingMessage);
                 }
             } catch (error) {
                 console.error('Chat Error:', error);
@@ -124,6 +119,104 @@
             }
         }
 
+        async ajaxReply(userMessage, loadingMessage) {
+            const response = await $.ajax({
+                url: souqcoom_ajax.ajax_url,
+                type: 'POST',
+                data: {
+                    action: 'souqcoom_chat_message',
+                    message: userMessage,
+                    nonce: souqcoom_ajax.nonce
+                }
+            });
+
+            // Remove loading animation
+            loadingMessage.remove();
+
+            if (response.success) {
+                this.chatbox.append(this.createChatMessage(response.data, 'incoming'));
+            } else {
+                throw new Error(response.data);
+            }
+        }
+
+        canStream() {
+            return Boolean(souqcoom_ajax.stream_url) && 'fetch' in window &&
+                'ReadableStream' in window && 'TextDecoder' in window;
+        }
+
+        async streamReply(userMessage, loadingMessage) {
+            const startTime = performance.now();
+            const response = await fetch(souqcoom_ajax.stream_url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream'
+                },
+                body: JSON.stringify({
+                    message: userMessage,
+                    language: souqcoom_ajax.is_rtl ? 'ar' : 'en'
+                })
+            });
+
+            if (!response.ok || !response.body) {
+                throw new Error('Stream request failed with status ' + response.status);
+            }
+
+            // Render tokens as they arrive instead of waiting for the full answer
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let text = '';
+            let messageLi = null;
+
+            try {
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                        const rawEvent = buffer.slice(0, boundary);
+                        buffer = buffer.slice(boundary + 2);
+
+                        let event = 'message';
+                        const dataLines = [];
+                        rawEvent.split('\n').forEach((line) => {
+                            if (line.startsWith('event:')) event = line.slice(6).trim();
+                            else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+                        });
+                        const data = dataLines.join('\n');
+                        if (data === '[DONE]') break;
+
+                        const payload = JSON.parse(data);
+                        if (event === 'error') {
+                            throw new Error(payload.error);
+                        }
+                        if (!messageLi) {
+                            console.debug('Souqcoom Chat time to first token (ms):', Math.round(performance.now() - startTime));
+                            loadingMessage.remove();
+                            messageLi = this.createChatMessage('', 'incoming');
+                            this.chatbox.append(messageLi);
+                        }
+                        text += payload.delta;
+                        messageLi.find('p').text(text);
+                        this.chatbox.scrollTop(this.chatbox[0].scrollHeight);
+                    }
+                }
+            } catch (error) {
+                // Drop the partial answer; the caller replaces it with a complete one
+                if (messageLi) messageLi.remove();
+                throw error;
+            }
+
+            loadingMessage.remove();
+            if (!text) {
+                throw new Error('Empty streamed response');
+            }
+        }
+
         handleKeyPress(e) {
             // Send on Enter (but not on mobile or when Shift is pressed)
             if (e.key === 'Enter' && !e.shiftKey && window.innerWidth > 768) {
@@ -18,6 +18,7 @@ define('SOUQCOOM_VERSION', '1.0.0');
 define('SOUQCOOM_PLUGIN_FILE', __FILE__);
 define('SOUQCOOM_PLUGIN_PATH', plugin_dir_path(__FILE__));
 define('SOUQCOOM_PLUGIN_URL', plugin_dir_url(__FILE__));
+define('SOUQCOOM_DEFAULT_API_URL', 'https://souqcoom-support.vercel.app/chat');
 
 // Plugin initialization
 function souqcoom_init() {
@@ -80,6 +81,8 @@ function souqcoom_enqueue_scripts() {
     // Localize script with necessary data
     wp_localize_script('souqcoom-chat-script', 'souqcoom_ajax', array(
         'ajax_url' => admin_url('admin-ajax.php'),
+        // Streaming endpoint (Server-Sent Events) next to the configured chat endpoint
+        'stream_url' => souqcoom_api_url() . '/stream',
         'nonce' => wp_create_nonce('souqcoom_chat_nonce'),
         'is_rtl' => is_rtl(),
         'lang' => get_locale(),
@@ -146,6 +149,13 @@ function souqcoom_chat_widget_html() {
     return ob_get_clean();
 }
 
+// Chat endpoint from the plugin settings, without a trailing slash
+function souqcoom_api_url() {
+    $options = get_option('souqcoom_settings', array());
+    $api_url = !empty($options['api_url']) ? $options['api_url'] : SOUQCOOM_DEFAULT_API_URL;
+    return untrailingslashit($api_url);
+}
+
 // Handle AJAX chat messages
 function souqcoom_handle_chat_message() {
     // Verify nonce
@@ -163,7 +173,7 @@ function souqcoom_handle_chat_message() {
 
     try {
         // Prepare API request
-        $api_url = 'https://souqcoom-support.vercel.app/chat';
+        $api_url = souqcoom_api_url();
         $response = wp_remote_post($api_url, array(
             'timeout' => 15,
             'headers' => array(
@@ -264,7 +274,7 @@ function souqcoom_settings_section_callback() {
 
 function souqcoom_api_url_callback() {
     $options = get_option('souqcoom_settings', array());
-    $api_url = isset($options['api_url']) ? $options['api_url'] : 'https://souqcoom-support.vercel.app/chat';
+    $api_url = isset($options['api_url']) ? $options['api_url'] : SOUQCOOM_DEFAULT_API_URL;
     ?>
     <input type="url" name="souqcoom_settings[api_url]" value="<?php echo esc_attr($api_url); ?>" class="regular-text">
     <p class="description">